@@ -3,17 +3,56 @@
 
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
-from typing import Optional, Tuple, List
+from typing import Iterable, Optional, Tuple, List
+from concurrent.futures import ThreadPoolExecutor
+import functools
 import os
-import math
+
+
+# Number of quantized trail intensities the trail colors are tabulated for
+TRAIL_COLOR_LEVELS = 4096
+
+# Slight anti-aliasing blur followed by a slight sharpen, folded into a single
+# separable 3x3 convolution (the outer product of these weights, which sum to 1)
+_ENHANCE_WEIGHTS = (0.09, 0.82, 0.09)
+ENHANCE_KERNEL = ImageFilter.Kernel(
+    (3, 3), [row * col for row in _ENHANCE_WEIGHTS for col in _ENHANCE_WEIGHTS], scale=1
+)
+
+
+@functools.lru_cache(maxsize=4)
+def _get_font(size: int) -> ImageFont.ImageFont:
+    """Load the title font once per size, falling back to the default font."""
+    # Try to use a nice font, fall back to default if not available
+    try:
+        return ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", size)
+    except (OSError, IOError):
+        try:
+            return ImageFont.truetype("arial.ttf", size)
+        except (OSError, IOError):
+            return ImageFont.load_default()
+
+
+@functools.lru_cache(maxsize=64)
+def _measure_text(text: str, size: int) -> Tuple[int, int]:
+    """Measure the width and height of text in the title font of the given size."""
+    # Measuring doesn't depend on the target image, so any scratch canvas will do
+    draw = ImageDraw.Draw(Image.new('1', (1, 1)))
+    bbox = draw.textbbox((0, 0), text, font=_get_font(size))
+    return bbox[2] - bbox[0], bbox[3] - bbox[1]
 
 
 class PreviewGenerator:
-    """Generates preview images from Physarum simulation data."""
+    """Generates preview images from Physarum simulation data.
+    
+    A generator holds only its configuration, so one instance can render
+    several previews concurrently from different threads.
+    """
     
     def __init__(self, width: int = 800, height: int = 800, 
                  background_color: Tuple[int, int, int] = (30, 30, 30),
-                 trail_color: Tuple[int, int, int] = (220, 220, 220)):
+                 trail_color: Tuple[int, int, int] = (220, 220, 220),
+                 jpeg_quality: int = 85):
         """Initialize the preview generator.
         
         Args:
@@ -21,20 +60,19 @@ class PreviewGenerator:
             height: Output image height in pixels
             background_color: RGB color for the background (dark gray)
             trail_color: RGB color for the trails (light gray)
+            jpeg_quality: JPEG quality (1-95) for saved previews
         """
         self.output_width = width
         self.output_height = height
         self.background_color = background_color
         self.trail_color = trail_color
-        
-        # 3D visualization parameters
-        self.iso_angle = math.radians(30)  # Isometric angle for 3D effect
-        self.depth_scale = 0.5  # Depth scaling factor for 3D layers
+        self.jpeg_quality = jpeg_quality
     
     def generate_preview(self, trail_map: np.ndarray, 
                         output_path: str,
                         threshold: float = 0.1,
-                        title: Optional[str] = None) -> None:
+                        title: Optional[str] = None,
+                        enhance: bool = True) -> None:
         """Generate a preview image from trail map data.
         
         Args:
@@ -42,114 +80,121 @@ class PreviewGenerator:
             output_path: Path to save the preview image
             threshold: Minimum trail intensity to show
             title: Optional title to add to the image
+            enhance: Apply the subtle smoothing filter; skip it for faster previews
         """
-        # Normalize trail map to 0-1 range
-        trail_normalized = np.clip(trail_map, 0, None)
-        if np.max(trail_normalized) > 0:
-            trail_normalized = trail_normalized / np.max(trail_normalized)
-        
-        # Apply threshold
-        trail_thresholded = np.where(trail_normalized > threshold, trail_normalized, 0)
-        
-        # Create base image
-        img = Image.new('RGB', (self.output_width, self.output_height), self.background_color)
-        
-        # Scale trail map to output dimensions
-        trail_resized = self._resize_trail_map(trail_thresholded)
-        
-        # Apply trail visualization
-        self._apply_trail_visualization(img, trail_resized)
+        # Normalize to 0-1, apply threshold and scale to output dimensions. The
+        # normalization passes run on whichever of the simulation grid and the
+        # resized map is smaller.
+        if trail_map.size > self.output_width * self.output_height:
+            trail_resized = self._normalize_trail_map(self._resize_trail_map(trail_map), threshold)
+        else:
+            trail_normalized = self._normalize_trail_map(trail_map.astype(np.float32), threshold)
+            trail_resized = self._resize_trail_map(trail_normalized)
+        
+        # Color the trails straight into a new RGB image
+        img = Image.fromarray(self._apply_trail_visualization(trail_resized))
         
         # Add subtle enhancement
-        img = self._enhance_image(img)
+        if enhance:
+            img = self._enhance_image(img)
         
         # Add title if provided
         if title:
             img = self._add_title(img, title)
         
         # Save the image
-        img.save(output_path, 'JPEG', quality=90, optimize=True)
+        self._save_jpeg(img, output_path)
+    
+    def generate_previews(self, items: Iterable[tuple], max_workers: Optional[int] = None) -> None:
+        """Generate several previews in parallel on a thread pool.
+        
+        Resizing, coloring, filtering and JPEG encoding mostly run in NumPy and
+        Pillow code that releases the GIL, so previews render concurrently.
+        
+        Args:
+            items: Argument tuples for generate_preview, e.g. (trail_map, output_path)
+                or (trail_map, output_path, threshold, title)
+            max_workers: Number of threads, defaulting to the CPU count
+        """
+        with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+            # Consume the results so any exception is raised here
+            list(executor.map(lambda args: self.generate_preview(*args), items))
+    
+    def _save_jpeg(self, img: Image.Image, output_path: str) -> None:
+        """Save a preview as JPEG, without the extra Huffman optimization pass."""
+        img.save(output_path, 'JPEG', quality=self.jpeg_quality, optimize=False, subsampling=2)
+    
+    def _normalize_trail_map(self, trail_map: np.ndarray, threshold: float) -> np.ndarray:
+        """Clip, scale to the 0-1 range and threshold a float trail map in place.
+        
+        Args:
+            trail_map: Float array of trail intensities, modified in place
+            threshold: Normalized intensities at or below this are set to 0
+            
+        Returns:
+            The same array
+        """
+        np.clip(trail_map, 0, None, out=trail_map)
+        max_trail = trail_map.max()
+        if max_trail > 0:
+            trail_map *= 1.0 / max_trail
+        np.multiply(trail_map, trail_map > threshold, out=trail_map)
+        return trail_map
     
     def _resize_trail_map(self, trail_map: np.ndarray) -> np.ndarray:
         """Resize trail map to match output dimensions."""
-        from scipy.ndimage import zoom
-        
         height, width = trail_map.shape
         scale_y = self.output_height / height
         scale_x = self.output_width / width
         
         # Use the smaller scale to maintain aspect ratio and center
         scale = min(scale_x, scale_y)
+        resized_w = max(1, round(width * scale))
+        resized_h = max(1, round(height * scale))
         
-        # Resize with anti-aliasing
-        resized = zoom(trail_map, scale, order=1)
+        # Resize with anti-aliasing (bilinear, on a single-channel float image)
+        trail_img = Image.fromarray(trail_map.astype(np.float32, copy=False))
+        resized = np.asarray(trail_img.resize((resized_w, resized_h), Image.BILINEAR))
         
         # Center the resized image
-        resized_h, resized_w = resized.shape
         start_y = (self.output_height - resized_h) // 2
         start_x = (self.output_width - resized_w) // 2
         
-        result = np.zeros((self.output_height, self.output_width))
+        result = np.zeros((self.output_height, self.output_width), dtype=np.float32)
         end_y = min(start_y + resized_h, self.output_height)
         end_x = min(start_x + resized_w, self.output_width)
         result[start_y:end_y, start_x:end_x] = resized[:end_y-start_y, :end_x-start_x]
         
         return result
     
-    def _apply_trail_visualization(self, img: Image.Image, trail_map: np.ndarray) -> None:
-        """Apply trail visualization to the image."""
-        # Convert to numpy array for processing
-        img_array = np.array(img)
-        
-        # Create color mapping
-        for y in range(trail_map.shape[0]):
-            for x in range(trail_map.shape[1]):
-                intensity = trail_map[y, x]
-                if intensity > 0:
-                    # Blend trail color with background based on intensity
-                    alpha = intensity ** 0.7  # Gamma correction for better visibility
-                    
-                    # Calculate blended color
-                    bg_r, bg_g, bg_b = self.background_color
-                    trail_r, trail_g, trail_b = self.trail_color
-                    
-                    blended_r = int(bg_r * (1 - alpha) + trail_r * alpha)
-                    blended_g = int(bg_g * (1 - alpha) + trail_g * alpha)
-                    blended_b = int(bg_b * (1 - alpha) + trail_b * alpha)
-                    
-                    img_array[y, x] = [blended_r, blended_g, blended_b]
-        
-        # Convert back to PIL Image
-        enhanced_img = Image.fromarray(img_array.astype(np.uint8))
-        img.paste(enhanced_img)
+    def _apply_trail_visualization(self, trail_map: np.ndarray) -> np.ndarray:
+        """Color a trail map, returning an RGB array of the same height and width."""
+        # Blend trail color with background based on intensity, with gamma
+        # correction for better visibility; zero intensity leaves the background.
+        # The blend is tabulated for quantized intensities so the image itself
+        # is colored with a single uint8 lookup.
+        alpha = np.linspace(0, 1, TRAIL_COLOR_LEVELS) ** 0.7
+        bg = np.array(self.background_color, dtype=np.float64)
+        trail = np.array(self.trail_color, dtype=np.float64)
+        color_table = np.clip(bg + (trail - bg) * alpha[:, None], 0, 255).astype(np.uint8)
+        
+        # Round to the nearest level, reusing the scaled intensities' buffer
+        levels = np.multiply(trail_map, TRAIL_COLOR_LEVELS - 1, dtype=np.float32)
+        levels += 0.5
+        return np.take(color_table, levels.astype(np.uint16), axis=0)
     
     def _enhance_image(self, img: Image.Image) -> Image.Image:
         """Apply subtle enhancement to improve visual appeal."""
-        # Apply slight gaussian blur for anti-aliasing
-        img = img.filter(ImageFilter.GaussianBlur(radius=0.5))
-        
-        # Slight sharpening to counteract blur
-        img = img.filter(ImageFilter.UnsharpMask(radius=1, percent=10, threshold=2))
-        
-        return img
+        return img.filter(ENHANCE_KERNEL)
     
     def _add_title(self, img: Image.Image, title: str) -> Image.Image:
         """Add a title to the image."""
         draw = ImageDraw.Draw(img)
         
-        # Try to use a nice font, fall back to default if not available
-        try:
-            font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 24)
-        except (OSError, IOError):
-            try:
-                font = ImageFont.truetype("arial.ttf", 24)
-            except (OSError, IOError):
-                font = ImageFont.load_default()
+        font = _get_font(24)
         
         # Get text size
-        bbox = draw.textbbox((0, 0), title, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
+        text_width, text_height = _measure_text(title, 24)
         
         # Position text at top center with padding
         x = (self.output_width - text_width) // 2
@@ -159,14 +204,9 @@ class PreviewGenerator:
         outline_color = (0, 0, 0)
         text_color = (255, 255, 255)
         
-        # Draw outline
-        for dx in [-1, 0, 1]:
-            for dy in [-1, 0, 1]:
-                if dx != 0 or dy != 0:
-                    draw.text((x + dx, y + dy), title, font=font, fill=outline_color)
-        
-        # Draw main text
-        draw.text((x, y), title, font=font, fill=text_color)
+        # Draw main text and its 1px outline in a single pass
+        draw.text((x, y), title, font=font, fill=text_color,
+                  stroke_width=1, stroke_fill=outline_color)
         
         return img
     
@@ -221,29 +261,40 @@ class PreviewGenerator:
         if not layers:
             return
         
-        # Create base image with larger canvas for 3D projection
-        img = Image.new('RGB', (self.output_width, self.output_height), self.background_color)
+        # Work on a plain RGB array filled with the background; it only becomes
+        # a PIL image once compositing is done
+        img_array = np.empty((self.output_height, self.output_width, 3), dtype=np.uint8)
+        img_array[:] = self.background_color
         
         # Calculate 3D projection parameters
         layer_count = len(layers)
         
-        # Process layers from bottom to top for proper depth ordering
-        for layer_idx, layer_mask in enumerate(layers):
-            if not np.any(layer_mask):
-                continue  # Skip empty layers
-            
-            # Calculate depth-based color intensity (darker for deeper layers)
-            depth_ratio = layer_idx / max(1, layer_count - 1)  # 0 (bottom) to 1 (top)
-            intensity = 0.3 + 0.7 * depth_ratio  # Range from 30% to 100% intensity
-            
-            # Calculate layer color with depth shading
-            layer_r = int(self.background_color[0] + (self.trail_color[0] - self.background_color[0]) * intensity)
-            layer_g = int(self.background_color[1] + (self.trail_color[1] - self.background_color[1]) * intensity)
-            layer_b = int(self.background_color[2] + (self.trail_color[2] - self.background_color[2]) * intensity)
-            layer_color = (layer_r, layer_g, layer_b)
-            
+        # Depth-based layer colors, darker for deeper layers: intensity ranges
+        # from 30% (bottom) to 100% (top) of the way from background to trail color
+        depth_ratio = np.arange(layer_count) / max(1, layer_count - 1)
+        intensity = 0.3 + 0.7 * depth_ratio
+        background = np.array(self.background_color, dtype=np.float64)
+        trail = np.array(self.trail_color, dtype=np.float64)
+        layer_colors = (background + (trail - background) * intensity[:, None]).astype(np.uint8)
+        
+        # Index of the topmost layer drawn at each pixel, -1 where no layer is drawn
+        top_layer = np.full((self.output_height, self.output_width), -1, dtype=np.int32)
+        
+        # Every layer has the same grid, so project it onto the image once
+        layer_stack = np.stack(layers)
+        projection = self._layer_projection(*layer_stack.shape[1:])
+        
+        # Find the non-empty layers in a single pass over the stack
+        nonempty_layers = np.flatnonzero(layer_stack.reshape(layer_count, -1).any(axis=1))
+        
+        # Process layers from bottom to top for proper depth ordering, skipping empty layers
+        for layer_idx in nonempty_layers:
             # Apply 3D isometric transformation to this layer
-            self._render_3d_layer(img, layer_mask, layer_idx, layer_count, layer_color)
+            self._render_3d_layer(top_layer, layer_stack[layer_idx], layer_idx, layer_count, projection)
+        
+        # Color every pixel once, by the topmost layer covering it
+        self._composite_layers(img_array, top_layer, layer_colors)
+        img = Image.fromarray(img_array)
         
         # Apply enhancement
         img = self._enhance_image(img)
@@ -253,21 +304,48 @@ class PreviewGenerator:
             img = self._add_title(img, title)
         
         # Save the image
-        img.save(output_path, 'JPEG', quality=90, optimize=True)
+        self._save_jpeg(img, output_path)
     
-    def _render_3d_layer(self, img: Image.Image, layer_mask: np.ndarray, 
-                        layer_idx: int, total_layers: int, layer_color: Tuple[int, int, int]) -> None:
+    def _layer_projection(self, height: int, width: int) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Project a layer grid onto the output image, before any depth offset.
+        
+        All layers share the same grid, so this is computed once per preview.
+        
+        Args:
+            height, width: Shape of each layer
+            
+        Returns:
+            Screen row of each grid row, screen column of each grid column,
+            and the side length of a voxel square in pixels
+        """
+        # Scale layer to fit in output image with room for 3D offsets
+        scale_x = (self.output_width - 60) / width   # Leave room for 3D offsets
+        scale_y = (self.output_height - 60) / height
+        scale = min(scale_x, scale_y) * 0.8  # Additional margin for better appearance
+        
+        # Center the scaled layer
+        start_x = int((self.output_width - width * scale) / 2)
+        start_y = int((self.output_height - height * scale) / 2)
+        
+        row_y = (start_y + np.arange(height) * scale).astype(int)
+        col_x = (start_x + np.arange(width) * scale).astype(int)
+        return row_y, col_x, max(1, int(scale))
+    
+    def _render_3d_layer(self, top_layer: np.ndarray, layer_mask: np.ndarray, 
+                        layer_idx: int, total_layers: int,
+                        projection: Optional[Tuple[np.ndarray, np.ndarray, int]] = None) -> None:
         """Render a single layer with 3D isometric projection.
         
         Args:
-            img: PIL Image to draw on
+            top_layer: 2D array of layer indices; pixels covered by this layer are set to layer_idx
             layer_mask: 2D boolean array for this layer
             layer_idx: Index of this layer (0 = bottom)
             total_layers: Total number of layers
-            layer_color: RGB color for this layer
+            projection: Result of _layer_projection for this layer's shape, computed if omitted
         """
-        img_array = np.array(img)
-        height, width = layer_mask.shape
+        if projection is None:
+            projection = self._layer_projection(*layer_mask.shape)
+        row_y, col_x, voxel_size = projection
         
         # Calculate 3D offset for this layer (isometric projection)
         # Higher layers are offset up and to the right
@@ -275,48 +353,26 @@ class PreviewGenerator:
         x_offset = int(depth_progress * 40)  # Horizontal offset for depth
         y_offset = int(depth_progress * 20)  # Vertical offset for depth
         
-        # Scale layer to fit in output image with room for 3D offsets
-        scale_x = (self.output_width - 60) / width   # Leave room for 3D offsets
-        scale_y = (self.output_height - 60) / height
-        scale = min(scale_x, scale_y) * 0.8  # Additional margin for better appearance
-        
-        # Center the scaled layer
-        start_x = int((self.output_width - width * scale) / 2) + x_offset
-        start_y = int((self.output_height - height * scale) / 2) - y_offset
-        
-        # Render each solid voxel in this layer
-        for y in range(height):
-            for x in range(width):
-                if layer_mask[y, x]:
-                    # Calculate screen position
-                    screen_x = int(start_x + x * scale)
-                    screen_y = int(start_y + y * scale)
-                    
-                    # Draw a small rectangle for each voxel with proper bounds checking
-                    voxel_size = max(1, int(scale))
-                    self._draw_voxel_rect(img_array, screen_x, screen_y, voxel_size, layer_color)
-        
-        # Update the image
-        updated_img = Image.fromarray(img_array.astype(np.uint8))
-        img.paste(updated_img)
+        # Render each solid voxel in this layer as a small square at its screen position
+        voxel_ys, voxel_xs = np.nonzero(layer_mask)
+        voxel_offsets = np.arange(voxel_size)
+        screen_y = (row_y[voxel_ys] - y_offset)[:, None, None] + voxel_offsets[None, :, None]
+        screen_x = (col_x[voxel_xs] + x_offset)[:, None, None] + voxel_offsets[None, None, :]
+        screen_y, screen_x = np.broadcast_arrays(screen_y, screen_x)
+        
+        # Clip the squares to the image bounds
+        img_height, img_width = top_layer.shape
+        in_bounds = (screen_y >= 0) & (screen_y < img_height) & (screen_x >= 0) & (screen_x < img_width)
+        top_layer[screen_y[in_bounds], screen_x[in_bounds]] = layer_idx
     
-    def _draw_voxel_rect(self, img_array: np.ndarray, x: int, y: int, 
-                        size: int, color: Tuple[int, int, int]) -> None:
-        """Draw a small rectangle representing a voxel.
+    def _composite_layers(self, img_array: np.ndarray, top_layer: np.ndarray,
+                          layer_colors: np.ndarray) -> None:
+        """Color each pixel covered by a layer with that layer's color.
         
         Args:
-            img_array: Numpy array of the image
-            x, y: Top-left position of the rectangle
-            size: Size of the rectangle
-            color: RGB color tuple
+            img_array: RGB image array to draw on
+            top_layer: 2D array of the topmost layer index per pixel, -1 for none
+            layer_colors: (layers, 3) array of RGB colors indexed by layer
         """
-        height, width = img_array.shape[:2]
-        
-        # Ensure coordinates are within bounds
-        x1 = max(0, x)
-        y1 = max(0, y)
-        x2 = min(width, x + size)
-        y2 = min(height, y + size)
-        
-        if x1 < x2 and y1 < y2:
-            img_array[y1:y2, x1:x2] = color
\ No newline at end of file
+        covered = top_layer >= 0
+        img_array[covered] = layer_colors[top_layer[covered]]
@@ -46,10 +46,14 @@ TEST_PARAMETERS = {
     }
 }
 
+# Job statuses after which polling stops
+FINISHED_STATUSES = {"completed", "failed", "cancelled"}
+
 @pytest.mark.skip(reason="Integration test requires running backend service")
 def test_backend_api():
     """Test the backend API endpoints."""
     base_url = "http://localhost:8000"
+    max_wait_time = 2.0
     
     print("Testing backend API...")
     
@@ -79,11 +83,21 @@ def test_backend_api():
             if status_response.status_code == 200:
                 print("✓ Status endpoint working")
                 
-                # Wait a moment for the simulation to potentially complete
-                time.sleep(2)
+                # Poll until the simulation finishes or the wait runs out, starting
+                # at 100ms so a quick job is seen almost as soon as it completes
+                deadline = time.monotonic() + max_wait_time
+                delay = 0.1
+                while True:
+                    final_status = requests.get(f"{base_url}/api/simulate/{job_id}/status")
+                    if final_status.status_code != 200 or final_status.json()["status"] in FINISHED_STATUSES:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    time.sleep(min(delay, remaining))
+                    delay = min(delay * 2, 0.5)
                 
                 # Check final status
-                final_status = requests.get(f"{base_url}/api/simulate/{job_id}/status")
                 if final_status.status_code == 200:
                     status_data = final_status.json()
                     print(f"✓ Final status: {status_data['status']}")
@@ -156,6 +156,98 @@ class TestPreviewGenerator(unittest.TestCase):
             # Should still be square output but trail should be centered
             self.assertEqual(img.size, (400, 400))
 
+    
+    def test_preview_without_enhancement(self):
+        """Test that skipping enhancement keeps the unfiltered trail colors."""
+        generator = PreviewGenerator(width=20, height=20)
+        trail_map = np.zeros((20, 20))
+        trail_map[:, 10:] = 1.0
+        output_path = os.path.join(self.test_dir, "test_no_enhance.jpg")
+        
+        generator.generate_preview(trail_map, output_path, enhance=False)
+        
+        with Image.open(output_path) as img:
+            pixels = np.array(img)
+        # Allow for JPEG compression error
+        np.testing.assert_allclose(pixels[10, 0], generator.background_color, atol=2)
+        np.testing.assert_allclose(pixels[10, 19], generator.trail_color, atol=2)
+    
+    def test_generate_previews_in_parallel(self):
+        """Test that a batch of previews is written to every output path."""
+        output_paths = [os.path.join(self.test_dir, f"batch_{i}.jpg") for i in range(4)]
+        items = [(np.random.rand(20, 20), path, 0.1, f"Batch {i}")
+                 for i, path in enumerate(output_paths)]
+        
+        self.preview_generator.generate_previews(items, max_workers=2)
+        
+        for path in output_paths:
+            with Image.open(path) as img:
+                self.assertEqual(img.format, 'JPEG')
+                self.assertEqual(img.size, (400, 400))
+    
+    def test_trail_map_larger_than_output(self):
+        """Test that a trail map is normalized after downscaling it to the output."""
+        generator = PreviewGenerator(width=100, height=100)
+        trail_map = np.full((300, 300), 5.0)
+        trail_map[:, :150] = 0.2  # Below the threshold once normalized
+        output_path = os.path.join(self.test_dir, "test_large.jpg")
+        
+        generator.generate_preview(trail_map, output_path, threshold=0.1, enhance=False)
+        
+        with Image.open(output_path) as img:
+            pixels = np.array(img)
+        # Allow for JPEG compression error
+        np.testing.assert_allclose(pixels[50, 10], generator.background_color, atol=2)
+        np.testing.assert_allclose(pixels[50, 90], generator.trail_color, atol=2)
+    
+    def test_trail_visualization_blends_colors(self):
+        """Test that trail pixels are blended by gamma-corrected intensity."""
+        generator = PreviewGenerator(width=3, height=1)
+        trail_map = np.array([[0.0, 0.5, 1.0]])
+        
+        pixels = generator._apply_trail_visualization(trail_map)
+        
+        alpha = 0.5 ** 0.7
+        expected_mid = [int(bg * (1 - alpha) + trail * alpha)
+                        for bg, trail in zip(generator.background_color, generator.trail_color)]
+        self.assertEqual(pixels[0, 0].tolist(), list(generator.background_color))
+        np.testing.assert_allclose(pixels[0, 1], expected_mid, atol=1)
+        self.assertEqual(pixels[0, 2].tolist(), list(generator.trail_color))
+    
+    def test_render_3d_layer_draws_voxel_squares(self):
+        """Test that each solid voxel is drawn as a square scaled to the output."""
+        generator = PreviewGenerator(width=160, height=160)
+        top_layer = np.full((160, 160), -1)
+        layer_mask = np.zeros((4, 4), dtype=bool)
+        layer_mask[0, 0] = True
+        layer_mask[3, 2] = True
+        
+        generator._render_3d_layer(top_layer, layer_mask, 0, 1)
+        
+        # Scale is 20 pixels per voxel and the 80 pixel layer is centered
+        expected = np.zeros((160, 160), dtype=bool)
+        expected[40:60, 40:60] = True
+        expected[100:120, 80:100] = True
+        np.testing.assert_array_equal(top_layer == 0, expected)
+    
+    def test_3d_preview_upper_layers_cover_lower_layers(self):
+        """Test that compositing colors each pixel by the topmost layer drawn there."""
+        generator = PreviewGenerator(width=160, height=160)
+        top_layer = np.full((160, 160), -1)
+        layer_mask = np.ones((4, 4), dtype=bool)
+        
+        generator._render_3d_layer(top_layer, layer_mask, 0, 2)
+        generator._render_3d_layer(top_layer, layer_mask, 1, 2)
+        
+        img_array = np.zeros((160, 160, 3), dtype=np.uint8)
+        layer_colors = np.array([[255, 0, 0], [0, 255, 0]], dtype=np.uint8)
+        generator._composite_layers(img_array, top_layer, layer_colors)
+        
+        # The top layer is offset 40 pixels right and 20 pixels up
+        self.assertEqual(img_array[50, 50].tolist(), [255, 0, 0])
+        self.assertEqual(img_array[50, 90].tolist(), [0, 255, 0])
+        self.assertEqual(img_array[110, 110].tolist(), [255, 0, 0])
+        self.assertEqual(img_array[10, 10].tolist(), [0, 0, 0])
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,7 +1,7 @@
 # ABOUTME: API routes for model registry and historical model management
 # ABOUTME: Provides endpoints for listing, downloading, and managing persistent model history
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import FileResponse
 from typing import Dict, Any, Optional, List
 import os
@@ -9,22 +9,31 @@ import logging
 from datetime import datetime
 
 from ...models.responses import SuccessResponse, ErrorResponse
-from ...core.model_registry import model_registry, ModelRecord
+from ...core.model_registry import model_registry, ModelRecord, ModelRegistry
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/models", tags=["models"])
 
 
+async def get_model_registry() -> ModelRegistry:
+    """Provide the registry the routes operate on (override via app.dependency_overrides).
+    
+    Declared async so FastAPI resolves it on the event loop instead of the threadpool.
+    """
+    return model_registry
+
+
 @router.get("/", response_model=Dict[str, Any])
 async def list_models(
     source: Optional[str] = Query(None, description="Filter by source: 'cli', 'web', etc."),
     favorites: bool = Query(False, description="Only show favorite models"),
     limit: int = Query(50, description="Maximum number of results", ge=1, le=100),
-    offset: int = Query(0, description="Number of results to skip", ge=0)
+    offset: int = Query(0, description="Number of results to skip", ge=0),
+    registry: ModelRegistry = Depends(get_model_registry)
 ):
     """List all registered models with optional filtering."""
     try:
-        models = model_registry.list_models(
+        models = registry.list_models(
             source=source,
             favorite_only=favorites,
             limit=limit,
@@ -35,7 +44,7 @@ async def list_models(
         model_dicts = [model.to_dict() for model in models]
         
         # Get statistics for metadata
-        stats = model_registry.get_statistics()
+        stats = registry.get_statistics()
         
         return {
             "success": True,
@@ -62,10 +71,10 @@ async def list_models(
 
 
 @router.get("/statistics", response_model=Dict[str, Any])
-async def get_model_statistics():
+async def get_model_statistics(registry: ModelRegistry = Depends(get_model_registry)):
     """Get statistics about registered models."""
     try:
-        stats = model_registry.get_statistics()
+        stats = registry.get_statistics()
         
         return {
             "success": True,
@@ -85,10 +94,10 @@ async def get_model_statistics():
 
 
 @router.get("/{model_id}", response_model=Dict[str, Any])
-async def get_model(model_id: str):
+async def get_model(model_id: str, registry: ModelRegistry = Depends(get_model_registry)):
     """Get detailed information about a specific model."""
     try:
-        model = model_registry.get_model(model_id)
+        model = registry.get_model(model_id)
         
         if not model:
             raise HTTPException(
@@ -120,10 +129,10 @@ async def get_model(model_id: str):
 
 
 @router.get("/{model_id}/download/{file_type}")
-async def download_model_file(model_id: str, file_type: str):
+async def download_model_file(model_id: str, file_type: str, registry: ModelRegistry = Depends(get_model_registry)):
     """Download files from a registered model."""
     try:
-        model = model_registry.get_model(model_id)
+        model = registry.get_model(model_id)
         
         if not model:
             raise HTTPException(
@@ -204,10 +213,10 @@ async def download_model_file(model_id: str, file_type: str):
 
 
 @router.put("/{model_id}", response_model=SuccessResponse)
-async def update_model(model_id: str, updates: Dict[str, Any]):
+async def update_model(model_id: str, updates: Dict[str, Any], registry: ModelRegistry = Depends(get_model_registry)):
     """Update model metadata (name, favorite status, tags, etc.)."""
     try:
-        model = model_registry.get_model(model_id)
+        model = registry.get_model(model_id)
         
         if not model:
             raise HTTPException(
@@ -241,7 +250,7 @@ async def update_model(model_id: str, updates: Dict[str, Any]):
                 }
             )
         
-        success = model_registry.update_model(model_id, allowed_updates)
+        success = registry.update_model(model_id, allowed_updates)
         
         if not success:
             raise HTTPException(
@@ -272,10 +281,14 @@ async def update_model(model_id: str, updates: Dict[str, Any]):
 
 
 @router.delete("/{model_id}", response_model=SuccessResponse)
-async def delete_model(model_id: str, delete_files: bool = Query(False, description="Also delete associated files")):
+async def delete_model(
+    model_id: str,
+    delete_files: bool = Query(False, description="Also delete associated files"),
+    registry: ModelRegistry = Depends(get_model_registry)
+):
     """Delete a model from the registry and optionally its files."""
     try:
-        model = model_registry.get_model(model_id)
+        model = registry.get_model(model_id)
         
         if not model:
             raise HTTPException(
@@ -286,7 +299,7 @@ async def delete_model(model_id: str, delete_files: bool = Query(False, descript
                 }
             )
         
-        success = model_registry.delete_model(model_id, delete_files=delete_files)
+        success = registry.delete_model(model_id, delete_files=delete_files)
         
         if not success:
             raise HTTPException(
@@ -319,10 +332,10 @@ async def delete_model(model_id: str, delete_files: bool = Query(False, descript
 
 
 @router.post("/scan", response_model=SuccessResponse)
-async def scan_models():
+async def scan_models(registry: ModelRegistry = Depends(get_model_registry)):
     """Trigger a scan of the output directory to register new models."""
     try:
-        registered_count = model_registry.scan_and_register_models()
+        registered_count = registry.scan_and_register_models()
         
         return SuccessResponse(
             message=f"Scan completed. Registered {registered_count} new models."
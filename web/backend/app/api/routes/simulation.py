@@ -2,7 +2,7 @@
 # ABOUTME: Handles simulation creation, status queries, results, and cancellation
 
 from fastapi import APIRouter, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 from typing import Dict, Any
 import os
 import logging
@@ -175,7 +175,9 @@ async def start_simulation(request: SimulationRequest):
         )
 
 
-@router.get("/simulate/{job_id}/status", response_model=SimulationStatusResponse)
+# Status and result responses are built from already-validated models, so they
+# are dumped directly instead of being re-validated through response_model
+@router.get("/simulate/{job_id}/status", responses={200: {"model": SimulationStatusResponse}})
 async def get_simulation_status(job_id: str):
     """Get the current status of a simulation job."""
     try:
@@ -190,7 +192,7 @@ async def get_simulation_status(job_id: str):
                 }
             )
         
-        return SimulationStatusResponse(
+        status_response = SimulationStatusResponse(
             job_id=job_id,
             status=job.status,
             progress=job.progress,
@@ -198,6 +200,7 @@ async def get_simulation_status(job_id: str):
             started_at=job.started_at,
             completed_at=job.completed_at
         )
+        return ORJSONResponse(content=status_response.model_dump(mode="json"))
         
     except HTTPException:
         raise
@@ -216,7 +219,7 @@ async def get_simulation_status(job_id: str):
         )
 
 
-@router.get("/simulate/{job_id}/result", response_model=SimulationResult)
+@router.get("/simulate/{job_id}/result", responses={200: {"model": SimulationResult}})
 async def get_simulation_result(job_id: str):
     """Get the result of a completed simulation."""
     try:
@@ -245,7 +248,7 @@ async def get_simulation_result(job_id: str):
         for file_type, file_path in job.result_files.items():
             relative_files[file_type] = os.path.basename(file_path)
         
-        return SimulationResult(
+        result = SimulationResult(
             job_id=job_id,
             status=job.status,
             parameters=job.parameters,
@@ -255,6 +258,7 @@ async def get_simulation_result(job_id: str):
             completed_at=job.completed_at,
             file_sizes=job.file_sizes
         )
+        return ORJSONResponse(content=result.model_dump(mode="json"))
         
     except HTTPException:
         raise
@@ -9,6 +9,12 @@ class Settings:
     HOST = os.getenv("HOST", "0.0.0.0")
     PORT = int(os.getenv("PORT", 8000))
     
+    # Uvicorn worker processes. Simulation jobs and their WebSocket progress
+    # connections live in process memory, so status polls and progress for a
+    # job only work on the worker that created it; keep one worker until that
+    # state moves to a shared store
+    WORKERS = int(os.getenv("WEB_WORKERS", 1))
+    
     # CORS settings for production
     FRONTEND_URL = os.getenv("FRONTEND_URL", "")
     
@@ -37,6 +43,9 @@ class Settings:
     OUTPUT_DIR = Path(os.getenv("OUTPUT_DIR", "output"))
     MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", 100 * 1024 * 1024))  # 100MB
     
+    # Expose the model history API and scan OUTPUT_DIR for existing models on startup
+    ENABLE_MODEL_REGISTRY = os.getenv("ENABLE_MODEL_REGISTRY", "true").lower() == "true"
+    
     # Database settings
     DATABASE_URL = os.getenv("DATABASE_URL", f"{OUTPUT_DIR}/models.db")
 
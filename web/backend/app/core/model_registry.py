@@ -2,19 +2,30 @@
 # ABOUTME: Manages SQLite database and file system scanning for complete model history
 
 import sqlite3
-import json
+import orjson
 import os
 import time
 import logging
 import hashlib
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, Iterator, List, Optional, Any, Tuple
 from dataclasses import dataclass, field
 import uuid
 
+from ..config import settings
+
 logger = logging.getLogger(__name__)
 
+# Parameters can hold NumPy scalars and non-string keys, which json.dumps also accepted
+JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def dump_json_text(value: Any) -> str:
+    """Serialize a value to JSON text for the registry's TEXT columns."""
+    return orjson.dumps(value, option=JSON_OPTIONS).decode()
+
 
 @dataclass
 class ModelRecord:
@@ -58,7 +69,7 @@ class ModelRegistry:
         
         Args:
             output_dir: Directory to scan for model files
-            db_path: Path to SQLite database file (defaults to output_dir/models.db)
+            db_path: Path to SQLite database file or "file:" URI (defaults to output_dir/models.db)
         """
         self.output_dir = Path(output_dir)
         self.db_path = db_path or str(self.output_dir / "models.db")
@@ -71,32 +82,56 @@ class ModelRegistry:
         
         logger.info(f"ModelRegistry initialized with output_dir={output_dir}, db_path={self.db_path}")
     
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection to the registry database for a single call.
+        
+        The connection keeps up to 128 compiled statements, returns
+        sqlite3.Row rows and is closed when the block exits; callers commit
+        their own writes.
+        
+        A db_path starting with "file:" is opened as an SQLite URI, such as a
+        shared-cache in-memory database.
+        """
+        conn = sqlite3.connect(
+            self.db_path, uri=self.db_path.startswith("file:"), cached_statements=128
+        )
+        try:
+            conn.row_factory = sqlite3.Row
+            yield conn
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection):
+        """Create the models table and its indexes if they do not exist."""
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS models (
+                id TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                name TEXT NOT NULL,
+                stl_path TEXT,
+                json_path TEXT,
+                jpg_path TEXT,
+                parameters TEXT,  -- JSON as text
+                source TEXT DEFAULT 'unknown',
+                git_commit TEXT,
+                file_sizes TEXT,  -- JSON as text
+                favorite INTEGER DEFAULT 0,
+                tags TEXT DEFAULT ''
+            )
+        """)
+        
+        # Create indexes for common queries
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_created_at ON models(created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_source ON models(source)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_favorite ON models(favorite)")
+    
     def _init_database(self):
         """Initialize the SQLite database with required tables."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
-                    CREATE TABLE IF NOT EXISTS models (
-                        id TEXT PRIMARY KEY,
-                        created_at REAL NOT NULL,
-                        name TEXT NOT NULL,
-                        stl_path TEXT,
-                        json_path TEXT,
-                        jpg_path TEXT,
-                        parameters TEXT,  -- JSON as text
-                        source TEXT DEFAULT 'unknown',
-                        git_commit TEXT,
-                        file_sizes TEXT,  -- JSON as text
-                        favorite INTEGER DEFAULT 0,
-                        tags TEXT DEFAULT ''
-                    )
-                """)
-                
-                # Create indexes for common queries
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_created_at ON models(created_at)")
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_source ON models(source)")
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_favorite ON models(favorite)")
-                
+            with self._connect() as conn:
+                self._create_schema(conn)
                 conn.commit()
                 logger.info("Database initialized successfully")
                 
@@ -127,8 +162,8 @@ class ModelRegistry:
             Tuple of (parameters, source, git_commit)
         """
         try:
-            with open(json_path, 'r') as f:
-                data = json.load(f)
+            with open(json_path, 'rb') as f:
+                data = orjson.loads(f.read())
             
             parameters = data.get('parameters', {})
             git_commit = data.get('git_commit_hash')
@@ -148,33 +183,42 @@ class ModelRegistry:
             logger.warning(f"Failed to parse JSON metadata from {json_path}: {e}")
             return {}, 'unknown', None
     
-    def _scan_output_directory(self) -> List[Dict[str, str]]:
+    def _scan_output_directory(self) -> List[Dict[str, Any]]:
         """Scan output directory for model files and group them by base name.
         
         Returns:
-            List of file group dictionaries with 'stl', 'json', 'jpg' keys
+            List of file group dictionaries with 'stl', 'json', 'jpg' path keys
+            and a 'stats' dictionary holding each present file's os.stat_result
         """
         file_groups = {}
         
         try:
-            for file_path in self.output_dir.iterdir():
-                if not file_path.is_file():
-                    continue
-                
-                stem = file_path.stem
-                suffix = file_path.suffix.lower()
-                
-                # Initialize group if not exists
-                if stem not in file_groups:
-                    file_groups[stem] = {'stl': None, 'json': None, 'jpg': None}
-                
-                # Categorize file by extension
-                if suffix == '.stl':
-                    file_groups[stem]['stl'] = str(file_path)
-                elif suffix == '.json':
-                    file_groups[stem]['json'] = str(file_path)
-                elif suffix in ['.jpg', '.jpeg']:
-                    file_groups[stem]['jpg'] = str(file_path)
+            # scandir takes file types from the directory listing itself, so
+            # each model file costs a single stat call and other files none
+            with os.scandir(self.output_dir) as entries:
+                for entry in entries:
+                    if not entry.is_file():
+                        continue
+                    
+                    stem, suffix = os.path.splitext(entry.name)
+                    suffix = suffix.lower()
+                    
+                    # Categorize file by extension
+                    if suffix == '.stl':
+                        file_type = 'stl'
+                    elif suffix == '.json':
+                        file_type = 'json'
+                    elif suffix in ['.jpg', '.jpeg']:
+                        file_type = 'jpg'
+                    else:
+                        continue
+                    
+                    # Initialize group if not exists
+                    group = file_groups.setdefault(
+                        stem, {'stl': None, 'json': None, 'jpg': None, 'stats': {}}
+                    )
+                    group[file_type] = entry.path
+                    group['stats'][file_type] = entry.stat()
             
             # Convert to list and filter out groups without any core files
             return [group for group in file_groups.values() 
@@ -193,14 +237,14 @@ class ModelRegistry:
         logger.info("Scanning output directory for models...")
         
         file_groups = self._scan_output_directory()
-        registered_count = 0
+        new_models = {}
         
         for group in file_groups:
             try:
                 # Generate ID and check if already registered
                 model_id = self._generate_model_id(group['json'], group['stl'])
                 
-                if self.get_model(model_id):
+                if model_id in new_models or self.get_model(model_id):
                     continue  # Already registered
                 
                 # Parse metadata if JSON exists
@@ -220,18 +264,19 @@ class ModelRegistry:
                 elif group['json']:
                     name = Path(group['json']).stem
                 
-                # Get file sizes
-                file_sizes = {}
-                for file_type, file_path in group.items():
-                    if file_path and os.path.exists(file_path):
-                        file_sizes[file_type] = os.path.getsize(file_path)
+                # Get file sizes from the stats taken while scanning
+                stats = group['stats']
+                file_sizes = {
+                    file_type: stats[file_type].st_size
+                    for file_type in ('stl', 'json', 'jpg') if file_type in stats
+                }
                 
                 # Get creation time from files
                 created_at = time.time()
-                if group['json'] and os.path.exists(group['json']):
-                    created_at = os.path.getctime(group['json'])
-                elif group['stl'] and os.path.exists(group['stl']):
-                    created_at = os.path.getctime(group['stl'])
+                if 'json' in stats:
+                    created_at = stats['json'].st_ctime
+                elif 'stl' in stats:
+                    created_at = stats['stl'].st_ctime
                 
                 # Create model record
                 model = ModelRecord(
@@ -247,16 +292,19 @@ class ModelRegistry:
                     file_sizes=file_sizes
                 )
                 
-                # Register the model
-                self.register_model(model)
-                registered_count += 1
-                
-                logger.info(f"Registered model: {model_id} ({name})")
+                new_models[model_id] = model
                 
             except Exception as e:
                 logger.error(f"Failed to register model from group {group}: {e}")
                 continue
         
+        # Register every new model in a single transaction
+        registered_count = 0
+        if new_models and self.register_models(list(new_models.values())):
+            registered_count = len(new_models)
+            for model in new_models.values():
+                logger.info(f"Registered model: {model.id} ({model.name})")
+        
         logger.info(f"Scan complete. Registered {registered_count} new models.")
         return registered_count
     
@@ -269,32 +317,43 @@ class ModelRegistry:
         Returns:
             True if successfully registered
         """
+        return self.register_models([model])
+    
+    def register_models(self, models: List[ModelRecord]) -> bool:
+        """Register several models in one transaction.
+        
+        Args:
+            models: ModelRecords to register
+            
+        Returns:
+            True if all models were registered; on failure none are
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
+            with self._connect() as conn:
+                conn.executemany("""
                     INSERT OR REPLACE INTO models 
                     (id, created_at, name, stl_path, json_path, jpg_path, 
                      parameters, source, git_commit, file_sizes, favorite, tags)
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
+                """, [(
                     model.id,
                     model.created_at,
                     model.name,
                     model.stl_path,
                     model.json_path,
                     model.jpg_path,
-                    json.dumps(model.parameters),
+                    dump_json_text(model.parameters),
                     model.source,
                     model.git_commit,
-                    json.dumps(model.file_sizes),
+                    dump_json_text(model.file_sizes),
                     int(model.favorite),
                     model.tags
-                ))
+                ) for model in models])
                 conn.commit()
                 return True
                 
         except Exception as e:
-            logger.error(f"Failed to register model {model.id}: {e}")
+            logger.error(f"Failed to register models {[model.id for model in models]}: {e}")
             return False
     
     def get_model(self, model_id: str) -> Optional[ModelRecord]:
@@ -307,8 +366,7 @@ class ModelRegistry:
             ModelRecord if found, None otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self._connect() as conn:
                 cursor = conn.execute("SELECT * FROM models WHERE id = ?", (model_id,))
                 row = cursor.fetchone()
                 
@@ -320,10 +378,10 @@ class ModelRegistry:
                         stl_path=row['stl_path'],
                         json_path=row['json_path'],
                         jpg_path=row['jpg_path'],
-                        parameters=json.loads(row['parameters'] or '{}'),
+                        parameters=orjson.loads(row['parameters'] or '{}'),
                         source=row['source'],
                         git_commit=row['git_commit'],
-                        file_sizes=json.loads(row['file_sizes'] or '{}'),
+                        file_sizes=orjson.loads(row['file_sizes'] or '{}'),
                         favorite=bool(row['favorite']),
                         tags=row['tags'] or ''
                     )
@@ -347,8 +405,7 @@ class ModelRegistry:
             List of ModelRecord objects
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self._connect() as conn:
                 
                 # Build query with filters
                 query = "SELECT * FROM models WHERE 1=1"
@@ -383,10 +440,10 @@ class ModelRegistry:
                         stl_path=row['stl_path'],
                         json_path=row['json_path'],
                         jpg_path=row['jpg_path'],
-                        parameters=json.loads(row['parameters'] or '{}'),
+                        parameters=orjson.loads(row['parameters'] or '{}'),
                         source=row['source'],
                         git_commit=row['git_commit'],
-                        file_sizes=json.loads(row['file_sizes'] or '{}'),
+                        file_sizes=orjson.loads(row['file_sizes'] or '{}'),
                         favorite=bool(row['favorite']),
                         tags=row['tags'] or ''
                     ))
@@ -408,7 +465,7 @@ class ModelRegistry:
             True if successfully updated
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 # Build update query dynamically
                 valid_fields = ['name', 'favorite', 'tags']
                 set_clauses = []
@@ -462,7 +519,7 @@ class ModelRegistry:
                             logger.warning(f"Failed to delete file {file_path}: {e}")
             
             # Remove from database
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.execute("DELETE FROM models WHERE id = ?", (model_id,))
                 conn.commit()
                 return cursor.rowcount > 0
@@ -478,7 +535,7 @@ class ModelRegistry:
             Dictionary with various statistics
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.execute("""
                     SELECT 
                         COUNT(*) as total_models,
@@ -506,4 +563,4 @@ class ModelRegistry:
 
 
 # Global instance
-model_registry = ModelRegistry()
\ No newline at end of file
+model_registry = ModelRegistry(output_dir=str(settings.OUTPUT_DIR))
\ No newline at end of file
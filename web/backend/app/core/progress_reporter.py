@@ -4,7 +4,8 @@
 import asyncio
 import json
 import logging
-from typing import Dict, Set
+import orjson
+from typing import Dict, List, Optional, Set
 from fastapi import WebSocket, WebSocketDisconnect
 
 from ..models.simulation import ProgressUpdate
@@ -13,6 +14,16 @@ from .simulation_manager import simulation_manager
 
 logger = logging.getLogger(__name__)
 
+# Progress updates are coalesced into one frame of at most this many updates,
+# sent as soon as the batch is full or this many seconds after its first update
+PROGRESS_BATCH_MAX_SIZE = 64
+PROGRESS_BATCH_MAX_WAIT = 0.05
+
+
+def encode_message(message: dict) -> bytes:
+    """Serialize a WebSocket message to JSON bytes, accepting numpy scalars as-is."""
+    return orjson.dumps(message, option=orjson.OPT_SERIALIZE_NUMPY)
+
 
 class ProgressReporter:
     """Manages WebSocket connections and progress updates for simulations."""
@@ -21,10 +32,15 @@ class ProgressReporter:
         # job_id -> set of WebSocket connections
         self.connections: Dict[str, Set[WebSocket]] = {}
         self.connection_jobs: Dict[WebSocket, str] = {}  # websocket -> job_id for cleanup
+        # job_id -> pending progress messages and the task that sends them in batches
+        self.progress_queues: Dict[str, asyncio.Queue] = {}
+        self.batch_tasks: Dict[str, asyncio.Task] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
     
     async def connect(self, websocket: WebSocket, job_id: str):
         """Register a new WebSocket connection for a specific job."""
         await websocket.accept()
+        self.loop = asyncio.get_running_loop()
         
         if job_id not in self.connections:
             self.connections[job_id] = set()
@@ -36,6 +52,7 @@ class ProgressReporter:
         if job_id not in [ws_job for ws_job in self.connections.keys() if len(self.connections[ws_job]) > 1]:
             # This is the first connection for this job, register callback
             simulation_manager.register_progress_callback(job_id, self._progress_callback)
+            self._start_batch_sender(job_id)
         
         logger.info(f"WebSocket connected for job {job_id} (total connections: {len(self.connections[job_id])})")
         
@@ -57,6 +74,7 @@ class ProgressReporter:
             if not self.connections[job_id]:
                 del self.connections[job_id]
                 simulation_manager.unregister_progress_callback(job_id)
+                self._stop_batch_sender(job_id)
                 logger.info(f"Unregistered progress callback for job {job_id} (no more connections)")
         
         del self.connection_jobs[websocket]
@@ -67,7 +85,7 @@ class ProgressReporter:
         try:
             job = simulation_manager.get_job_status(job_id)
             if not job:
-                await websocket.send_text(json.dumps({
+                await websocket.send_bytes(encode_message({
                     "type": "error",
                     "message": f"Job {job_id} not found"
                 }))
@@ -87,7 +105,7 @@ class ProgressReporter:
             if job.progress:
                 status_message["progress"] = job.progress.dict()
             
-            await websocket.send_text(json.dumps(status_message))
+            await websocket.send_bytes(encode_message(status_message))
             
             # If job is completed, send final result info
             if job.status.value in ["completed", "failed", "cancelled"]:
@@ -108,12 +126,12 @@ class ProgressReporter:
                     if job.mesh_quality:
                         result_message["mesh_quality"] = job.mesh_quality.dict()
                 
-                await websocket.send_text(json.dumps(result_message))
+                await websocket.send_bytes(encode_message(result_message))
                 
         except Exception as e:
             logger.error(f"Error sending initial status for {job_id}: {e}")
             try:
-                await websocket.send_text(json.dumps({
+                await websocket.send_bytes(encode_message({
                     "type": "error",
                     "message": f"Error getting job status: {str(e)}"
                 }))
@@ -121,8 +139,12 @@ class ProgressReporter:
                 pass  # WebSocket might be closed
     
     def _progress_callback(self, progress: ProgressUpdate):
-        """Callback function called by SimulationManager for progress updates."""
-        if progress.job_id not in self.connections:
+        """Callback function called by SimulationManager for progress updates.
+        
+        Runs on the simulation worker thread, so the update is handed to the
+        event loop rather than sent directly.
+        """
+        if progress.job_id not in self.connections or self.loop is None:
             return
         
         # Create message
@@ -131,8 +153,59 @@ class ProgressReporter:
             **progress.dict()
         }
         
-        # Send to all connections for this job
-        asyncio.create_task(self._broadcast_to_job(progress.job_id, message))
+        self.loop.call_soon_threadsafe(self._enqueue_progress, progress.job_id, message)
+    
+    def _enqueue_progress(self, job_id: str, message: dict):
+        """Queue a progress message for the job's batch sender."""
+        queue = self.progress_queues.get(job_id)
+        if queue is not None:
+            queue.put_nowait(message)
+    
+    def _start_batch_sender(self, job_id: str):
+        """Create the progress queue and batch sending task for a job."""
+        queue = asyncio.Queue()
+        self.progress_queues[job_id] = queue
+        self.batch_tasks[job_id] = asyncio.create_task(self._send_progress_batches(job_id, queue))
+    
+    def _stop_batch_sender(self, job_id: str):
+        """Cancel the batch sending task for a job and drop any pending updates."""
+        self.progress_queues.pop(job_id, None)
+        task = self.batch_tasks.pop(job_id, None)
+        if task is not None:
+            task.cancel()
+    
+    async def _collect_progress_batch(self, queue: asyncio.Queue) -> List[dict]:
+        """Wait for a progress message, then gather more until the batch is full or the wait expires.
+        
+        Messages that are already queued are taken immediately, so a backlog is
+        flushed in full batches without waiting.
+        """
+        batch = [await queue.get()]
+        deadline = asyncio.get_running_loop().time() + PROGRESS_BATCH_MAX_WAIT
+        
+        while len(batch) < PROGRESS_BATCH_MAX_SIZE:
+            if not queue.empty():
+                batch.append(queue.get_nowait())
+                continue
+            
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        
+        return batch
+    
+    async def _send_progress_batches(self, job_id: str, queue: asyncio.Queue):
+        """Send queued progress messages for a job as batched frames."""
+        while True:
+            batch = await self._collect_progress_batch(queue)
+            await self._broadcast_to_job(job_id, {
+                "type": "progress_batch",
+                "batch": batch
+            })
     
     async def _broadcast_to_job(self, job_id: str, message: dict):
         """Broadcast a message to all WebSocket connections for a specific job."""
@@ -142,11 +215,12 @@ class ProgressReporter:
         # Get list of connections (copy to avoid modification during iteration)
         connections = list(self.connections[job_id])
         
-        # Send message to all connections
+        # Serialize once and send the same frame to all connections
+        frame = encode_message(message)
         disconnected = []
         for websocket in connections:
             try:
-                await websocket.send_text(json.dumps(message))
+                await websocket.send_bytes(frame)
             except Exception as e:
                 logger.warning(f"Failed to send message to WebSocket for job {job_id}: {e}")
                 disconnected.append(websocket)
@@ -190,7 +264,7 @@ class ProgressReporter:
                 try:
                     data = json.loads(message)
                     if data.get("type") == "ping":
-                        await websocket.send_text(json.dumps({"type": "pong"}))
+                        await websocket.send_bytes(encode_message({"type": "pong"}))
                     elif data.get("type") == "request_status":
                         await self._send_initial_status(websocket, job_id)
                 except json.JSONDecodeError:
@@ -3,10 +3,19 @@
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response
+from fastapi.staticfiles import StaticFiles
+from starlette.types import ASGIApp, Receive, Scope, Send
+from pathlib import PurePosixPath
+import asyncio
+import atexit
+import gc
 import logging
+import logging.handlers
+import orjson
 import os
-import traceback
+import queue
 import time
 
 from .api.routes.simulation import router as simulation_router
@@ -16,17 +25,68 @@ from .core.model_registry import model_registry
 from .models.responses import HealthResponse
 from .config import settings
 
-# Configure logging
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that leaves message and traceback formatting to the listener thread."""
+
+    def prepare(self, record):
+        return record
+
+# Configure logging: the event loop only enqueues records, and a background
+# listener thread formats and writes them with the handlers basicConfig set up
 logging.basicConfig(level=logging.INFO)
+root_logger = logging.getLogger()
+log_queue = queue.SimpleQueue()
+log_listener = logging.handlers.QueueListener(
+    log_queue, *root_logger.handlers, respect_handler_level=True
+)
+root_logger.handlers = [DeferredQueueHandler(log_queue)]
+log_listener.start()
+atexit.register(log_listener.stop)
 logger = logging.getLogger(__name__)
 
+
+class ErrorLoggingMiddleware:
+    """Pure ASGI middleware that turns unhandled exceptions into JSON 500 responses."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as exc:
+            # Too late to replace a response that is already on the wire
+            if response_started:
+                raise
+            response = await global_exception_handler(Request(scope), exc)
+            await response(scope, receive, send)
+
 # Create FastAPI app
 app = FastAPI(
     title="3D Physarum Model Generator API",
     description="Backend API for generating 3D models from Physarum simulations",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
+# Catch unhandled exceptions innermost so error responses still get CORS headers
+app.add_middleware(ErrorLoggingMiddleware)
+
+# Compress larger JSON and file responses
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Add CORS middleware for frontend communication
 if settings.CORS_ALLOW_ALL:
     # Allow all origins (for testing)
@@ -38,52 +98,80 @@ if settings.CORS_ALLOW_ALL:
         allow_headers=["*"],
     )
 else:
-    # Specific origins only
+    # Specific origins only; Starlette checks `origin in allow_origins`, so a frozenset makes it O(1)
     app.add_middleware(
         CORSMiddleware,
-        allow_origins=settings.ALLOWED_ORIGINS,
+        allow_origins=frozenset(settings.ALLOWED_ORIGINS),
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
     )
 
-# Global exception handler for unhandled exceptions
-@app.exception_handler(Exception)
+# Global exception handler for unhandled exceptions, invoked by ErrorLoggingMiddleware
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler that provides detailed debugging information."""
-    # Extract request information
-    request_info = {
-        "method": request.method,
-        "url": str(request.url),
-        "headers": dict(request.headers),
-        "client": request.client.host if request.client else None,
-        "timestamp": time.time()
-    }
+    client = request.client.host if request.client else None
     
-    # Log detailed exception information
+    # Log detailed exception information (the message and traceback are formatted by the log listener)
     logger.error(
-        f"UNHANDLED EXCEPTION:\n"
-        f"Request: {request_info}\n"
-        f"Exception: {type(exc).__name__}: {str(exc)}\n"
-        f"Traceback: {traceback.format_exc()}",
-        exc_info=True
+        "UNHANDLED EXCEPTION: %s %s from %s -> %s: %s",
+        request.method,
+        request.url,
+        client,
+        type(exc).__name__,
+        exc,
+        exc_info=exc
     )
     
-    # Return detailed error response
-    return JSONResponse(
-        status_code=500,
-        content={
-            "error": "Internal server error",
-            "message": "An unexpected error occurred",
-            "error_type": type(exc).__name__,
-            "request_info": request_info if logger.level <= logging.DEBUG else None,
+    # Full request details, including a copy of the headers, are only collected when debugging
+    request_info = None
+    if logger.isEnabledFor(logging.DEBUG):
+        request_info = {
+            "method": request.method,
+            "url": str(request.url),
+            "headers": dict(request.headers),
+            "client": client,
             "timestamp": time.time()
         }
-    )
+        logger.debug("Request info: %s", request_info)
+    
+    # Return error response, serialized directly to bytes; request details are
+    # only included when this logger has DEBUG enabled
+    body = orjson.dumps({
+        "error": "Internal server error",
+        "message": "An unexpected error occurred",
+        "error_type": type(exc).__name__,
+        "request_info": request_info,
+        "timestamp": time.time()
+    })
+    return Response(content=body, status_code=500, media_type="application/json")
 
 # Include API routes
 app.include_router(simulation_router)
-app.include_router(models_router)
+if settings.ENABLE_MODEL_REGISTRY:
+    app.include_router(models_router)
+
+class GeneratedFiles(StaticFiles):
+    """Static file app restricted to generated model files.
+
+    The output directory also holds the model registry database and lock
+    files, so only STL, JSON and JPG files are served from it.
+    """
+
+    SERVED_SUFFIXES = frozenset({".stl", ".json", ".jpg"})
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if PurePosixPath(path).suffix.lower() not in self.SERVED_SUFFIXES:
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+# Serve generated files straight from disk, bypassing the download routes'
+# job lookups; a reverse proxy can serve this prefix from OUTPUT_DIR directly
+app.mount(
+    "/static/models",
+    GeneratedFiles(directory=settings.OUTPUT_DIR, check_dir=False),
+    name="models"
+)
 
 # Startup event to scan for existing models
 @app.on_event("startup")
@@ -100,22 +188,46 @@ async def startup_event():
     # Ensure output directory exists
     settings.OUTPUT_DIR.mkdir(exist_ok=True)
     
-    # Scan for existing models in output directory
+    # Scan for existing models in the background so the server accepts connections immediately
+    if settings.ENABLE_MODEL_REGISTRY:
+        app.state.model_scan_task = asyncio.create_task(scan_models_in_background())
+    
+    # Modules, routes and settings live for the whole process, so move them out
+    # of the garbage collector's generations instead of rescanning them
+    gc.freeze()
+    
+    logger.info("Application startup complete.")
+
+def scan_models_once():
+    """Scan the output directory and register the models found in it."""
+    registered_count = model_registry.scan_and_register_models()
+    logger.info(f"Startup scan complete. Found {registered_count} models.")
+
+async def scan_models_in_background():
+    """Run the startup model scan on a worker thread."""
     try:
-        registered_count = model_registry.scan_and_register_models()
-        logger.info(f"Startup scan complete. Found {registered_count} models.")
+        await asyncio.to_thread(scan_models_once)
     except Exception as e:
         logger.error(f"Failed to scan models on startup: {e}")
-    
-    logger.info("Application startup complete.")
 
-# Health check endpoint
-@app.get("/health", response_model=HealthResponse)
+# The health check bodies never change, so serialize them once
+HEALTH_RESPONSE_BODY = orjson.dumps(
+    HealthResponse(status="healthy", service="3d-physarum-api").model_dump()
+)
+STARTING_HEALTH_RESPONSE_BODY = orjson.dumps(
+    HealthResponse(status="starting", service="3d-physarum-api").model_dump()
+)
+
+# Health check endpoint. It answers 503 with status "starting" while the
+# startup model scan runs, so probes that only look at the status code wait
+@app.get("/health", responses={200: {"model": HealthResponse}, 503: {"model": HealthResponse}})
 async def health_check():
-    return HealthResponse(
-        status="healthy",
-        service="3d-physarum-api"
-    )
+    scan_task = getattr(app.state, "model_scan_task", None)
+    if scan_task is not None and not scan_task.done():
+        return Response(
+            content=STARTING_HEALTH_RESPONSE_BODY, status_code=503, media_type="application/json"
+        )
+    return Response(content=HEALTH_RESPONSE_BODY, media_type="application/json")
 
 # WebSocket endpoint for real-time progress updates
 @app.websocket("/ws/{job_id}")
@@ -127,11 +239,12 @@ async def websocket_endpoint(websocket: WebSocket, job_id: str):
         logger.info(f"WebSocket disconnected for job {job_id}")
     except Exception as e:
         logger.error(
-            f"WEBSOCKET ERROR for job {job_id}:\n"
-            f"Exception: {type(e).__name__}: {str(e)}\n"
-            f"Client: {websocket.client.host if websocket.client else 'unknown'}\n"
-            f"Traceback: {traceback.format_exc()}",
-            exc_info=True
+            "WEBSOCKET ERROR for job %s from %s -> %s: %s",
+            job_id,
+            websocket.client.host if websocket.client else 'unknown',
+            type(e).__name__,
+            e,
+            exc_info=e
         )
         try:
             await websocket.close(code=1011, reason=f"Server error: {str(e)}")
@@ -140,4 +253,19 @@ async def websocket_endpoint(websocket: WebSocket, job_id: str):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
\ No newline at end of file
+    # Multiple workers need the app as an import string, which each worker
+    # imports itself. A single worker serves this module's app directly, since
+    # an import string would load the module (and its log listener) a second time.
+    # uvloop (like asyncio) sets TCP_NODELAY on every accepted connection, so
+    # small WebSocket progress frames are not delayed by Nagle's algorithm.
+    uvicorn.run(
+        "app.main:app" if settings.WORKERS > 1 else app,
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=settings.WORKERS,
+        loop="uvloop",
+        http="httptools",
+        limit_concurrency=1000,
+        timeout_keep_alive=30,
+        log_level="info"
+    )
\ No newline at end of file
@@ -1,7 +1,7 @@
 # ABOUTME: Pydantic models for simulation parameters and API responses
 # ABOUTME: Defines request/response schemas for the 3D Physarum simulation API
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, ValidationInfo, field_validator
 from typing import Optional, List, Dict, Any
 from enum import Enum
 
@@ -26,6 +26,9 @@ class SimulationStatus(str, Enum):
 class SimulationParameters(BaseModel):
     """Parameters for starting a new simulation."""
     
+    # Parameters are never mutated after validation, so freezing skips per-attribute setters
+    model_config = ConfigDict(str_strip_whitespace=True, validate_default=False, frozen=True)
+    
     # Simulation parameters
     width: int = Field(default=100, ge=1, le=2000, description="Grid width in pixels")
     height: int = Field(default=100, ge=1, le=2000, description="Grid height in pixels")
@@ -67,16 +70,17 @@ class SimulationParameters(BaseModel):
     # Output parameters
     output: str = Field(default="physarum_3d_model.stl", description="Output STL filename")
     
-    @validator('speed_min', 'speed_max')
-    def validate_speeds(cls, v, values):
+    @field_validator('speed_min', 'speed_max')
+    @classmethod
+    def validate_speeds(cls, v: Optional[float], info: ValidationInfo) -> Optional[float]:
         """Validate speed min/max relationships."""
         if v is not None:
             if v <= 0:
                 raise ValueError("Speed values must be positive")
-            if 'speed_min' in values and 'speed_max' in values:
-                if values.get('speed_min') is not None and v is not None:
-                    if values['speed_min'] > v:
-                        raise ValueError("Speed minimum must be less than or equal to speed maximum")
+            # speed_min is declared first, so it is already in info.data when speed_max is validated
+            if info.field_name == 'speed_max' and info.data.get('speed_min') is not None:
+                if info.data['speed_min'] > v:
+                    raise ValueError("Speed minimum must be less than or equal to speed maximum")
         return v
 
 
@@ -8,7 +8,8 @@ import argparse
 def run_tests(test_suite="basic", verbose=True):
     """Run specified test suite."""
     
-    base_cmd = ["uv", "run", "pytest", "test_docker_integration.py"]
+    test_file = "test_docker_integration.py"
+    base_cmd = ["uv", "run", "pytest"]
     
     if verbose:
         base_cmd.append("-v")
@@ -44,18 +45,12 @@ def run_tests(test_suite="basic", verbose=True):
         print(f"Available suites: {list(test_suites.keys())}")
         return 1
     
-    # Add specific tests or run all
+    # Add specific tests or run all; a suite's tests share one pytest process
+    # and stop at the first failure
     if test_suite == "all":
-        cmd = base_cmd
+        cmd = base_cmd + [test_file]
     else:
-        for test in test_suites[test_suite]:
-            cmd = base_cmd + [f"test_docker_integration.py::{test}"]
-            print(f"Running: {' '.join(cmd)}")
-            result = subprocess.run(cmd)
-            if result.returncode != 0:
-                print(f"Test failed: {test}")
-                return result.returncode
-        return 0
+        cmd = base_cmd + ["-x"] + [f"{test_file}::{test}" for test in test_suites[test_suite]]
     
     print(f"Running: {' '.join(cmd)}")
     result = subprocess.run(cmd)
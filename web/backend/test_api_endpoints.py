@@ -3,12 +3,14 @@
 
 import pytest
 import asyncio
+import copy
+import importlib
+import os
 from fastapi.testclient import TestClient
 from fastapi import WebSocket
 import json
-import tempfile
-import os
 from unittest.mock import Mock, patch, MagicMock
+from types import SimpleNamespace
 from typing import Dict, Any
 
 from app.main import app
@@ -16,79 +18,130 @@ from app.models.simulation import SimulationRequest, SimulationParameters, Simul
 from app.core.simulation_manager import SimulationJob
 
 
-class TestAPIEndpoints:
-    """Test suite for all API endpoints to verify imports and functionality."""
+# A completed job as the endpoints read it; each test gets its own deep copy to modify
+MOCK_SIMULATION_JOB = SimulationJob(
+    job_id="test-job-123",
+    status=SimulationStatus.completed,
+    progress={
+        "job_id": "test-job-123",
+        "step": 100,
+        "total_steps": 100,
+        "layers_captured": 5,
+        "actor_count": 50,
+        "max_trail": 0.8,
+        "mean_trail": 0.3,
+        "estimated_completion_time": None,
+        "timestamp": 1234567890.0
+    },
+    error_message=None,
+    started_at=1234567890.0,
+    completed_at=1234567900.0,
+    parameters={
+        "steps": 100,
+        "actors": 50,
+        "width": 256,
+        "height": 256
+    },
+    result_files={
+        "stl": "/tmp/test.stl",
+        "json": "/tmp/test.json",
+        "jpg": "/tmp/test.jpg"
+    },
+    statistics={"total_actors": 50, "simulation_time": 10.0},
+    mesh_quality={
+        "vertex_count": 1000,
+        "face_count": 2000,
+        "volume": 125.5,
+        "surface_area": 300.2,
+        "is_watertight": True,
+        "is_winding_consistent": True,
+        "print_ready": True,
+        "issues": []
+    },
+    file_sizes={"stl": 1024, "json": 512, "jpg": 2048},
+    cancel_requested=False
+)
+
+
+# Constant psutil readings for the status endpoint
+MOCK_MEMORY = SimpleNamespace(
+    total=8 * 1024**3,  # 8GB
+    available=4 * 1024**3,  # 4GB
+    percent=50.0
+)
+MOCK_DISK = SimpleNamespace(
+    free=100 * 1024**3,  # 100GB
+    total=500 * 1024**3,  # 500GB
+    used=400 * 1024**3  # 400GB
+)
+MOCK_PROCESS_MEMORY = SimpleNamespace(
+    rss=100 * 1024**2,  # 100MB
+    vms=200 * 1024**2  # 200MB
+)
+MOCK_PROCESS = SimpleNamespace(
+    pid=1234,
+    memory_info=lambda: MOCK_PROCESS_MEMORY,
+    num_threads=lambda: 8
+)
+
+
+@pytest.fixture(scope="module")
+def client():
+    """Create test client for API testing, shared by the tests in this module."""
+    return TestClient(app)
+
+
+def build_sample_simulation_request():
+    """Build the sample simulation request shared by the endpoint tests."""
+    return SimulationRequest(
+        parameters=SimulationParameters(
+            steps=100,
+            actors=50,
+            width=256,
+            height=256,
+            smooth=True,
+            decay_rate=0.95,
+            diffusion_rate=0.1,
+            sensor_angle=45,
+            sensor_distance=9,
+            rotation_angle=45,
+            step_size=1,
+            seed=42
+        )
+    )
 
-    @pytest.fixture
-    def client(self):
-        """Create test client for API testing."""
-        return TestClient(app)
 
-    @pytest.fixture
-    def sample_simulation_request(self):
-        """Sample simulation request for testing."""
-        return SimulationRequest(
-            parameters=SimulationParameters(
-                steps=100,
-                actors=50,
-                width=256,
-                height=256,
-                smooth=True,
-                decay_rate=0.95,
-                diffusion_rate=0.1,
-                sensor_angle=45,
-                sensor_distance=9,
-                rotation_angle=45,
-                step_size=1,
-                seed=42
-            )
-        )
+@pytest.fixture(scope="module")
+def sample_simulation_request():
+    """Sample simulation request for testing; the parameters are immutable, so it is shared."""
+    return build_sample_simulation_request()
+
+
+@pytest.fixture(scope="module")
+def sample_simulation_payload(sample_simulation_request):
+    """JSON body for the sample request, serialized once for the module."""
+    return sample_simulation_request.model_dump(mode="json")
+
+
+@pytest.fixture(scope="module")
+def sample_files(tmp_path_factory):
+    """Result files for each downloadable type, written once for the module."""
+    directory = tmp_path_factory.mktemp("results")
+    files = {}
+    for file_type in ("stl", "json", "jpg"):
+        path = directory / f"test-job-123.{file_type}"
+        path.write_bytes(f"fake {file_type} data".encode())
+        files[file_type] = str(path)
+    return files
+
+
+class TestAPIEndpoints:
+    """Test suite for all API endpoints to verify imports and functionality."""
 
     @pytest.fixture
     def mock_simulation_job(self):
-        """Mock simulation job for testing."""
-        job = Mock(spec=SimulationJob)
-        job.job_id = "test-job-123"
-        job.status = SimulationStatus.completed
-        job.progress = {
-            "job_id": "test-job-123",
-            "step": 100,
-            "total_steps": 100,
-            "layers_captured": 5,
-            "actor_count": 50,
-            "max_trail": 0.8,
-            "mean_trail": 0.3,
-            "estimated_completion_time": None,
-            "timestamp": 1234567890.0
-        }
-        job.error_message = None
-        job.started_at = 1234567890.0
-        job.completed_at = 1234567900.0
-        job.parameters = {
-            "steps": 100,
-            "actors": 50,
-            "width": 256,
-            "height": 256
-        }
-        job.result_files = {
-            "stl": "/tmp/test.stl",
-            "json": "/tmp/test.json",
-            "jpg": "/tmp/test.jpg"
-        }
-        job.statistics = {"total_actors": 50, "simulation_time": 10.0}
-        job.mesh_quality = {
-            "vertex_count": 1000,
-            "face_count": 2000,
-            "volume": 125.5,
-            "surface_area": 300.2,
-            "is_watertight": True,
-            "is_winding_consistent": True,
-            "print_ready": True,
-            "issues": []
-        }
-        job.file_sizes = {"stl": 1024, "json": 512, "jpg": 2048}
-        job.cancel_requested = False
-        return job
+        """Mock simulation job for testing, copied from a shared template."""
+        return copy.deepcopy(MOCK_SIMULATION_JOB)
 
     def test_health_endpoint(self, client):
         """Test health check endpoint - exercises fastapi imports."""
@@ -98,9 +151,87 @@ class TestAPIEndpoints:
         assert data["status"] == "healthy"
         assert data["service"] == "3d-physarum-api"
 
+    def test_health_endpoint_while_model_scan_running(self, client):
+        """Test that health answers 503 'starting' until the startup model scan finishes."""
+        scan_task = Mock()
+        scan_task.done.return_value = False
+        app.state.model_scan_task = scan_task
+        try:
+            response = client.get("/health")
+            assert response.status_code == 503
+            assert response.json()["status"] == "starting"
+            scan_task.done.return_value = True
+            response = client.get("/health")
+            assert response.status_code == 200
+            assert response.json()["status"] == "healthy"
+        finally:
+            del app.state.model_scan_task
+
+    def test_startup_scan_runs_in_background(self, tmp_path):
+        """Test that startup schedules the model scan and it completes."""
+        with patch('app.main.model_registry') as mock_registry, \
+             patch('app.main.settings.OUTPUT_DIR', tmp_path):
+            mock_registry.scan_and_register_models.return_value = 0
+            async def wait_for_scan():
+                await app.state.model_scan_task
+
+            try:
+                with TestClient(app) as lifespan_client:
+                    lifespan_client.portal.call(wait_for_scan)
+                    assert lifespan_client.get("/health").json()["status"] == "healthy"
+            finally:
+                del app.state.model_scan_task
+            mock_registry.scan_and_register_models.assert_called_once()
+
+    def test_large_responses_are_gzipped(self, client):
+        """Test that responses over the size threshold are gzip-compressed."""
+        response = client.get("/openapi.json", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert "paths" in response.json()
+
+        # Small responses are sent uncompressed
+        response = client.get("/health", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+
+    def test_cors_allowed_origins(self, client):
+        """Test that only configured origins receive CORS headers."""
+        from app.config import settings
+        if settings.CORS_ALLOW_ALL:
+            pytest.skip("CORS_ALLOW_ALL is enabled")
+
+        response = client.get("/health", headers={"Origin": "http://localhost:5173"})
+        assert response.headers["access-control-allow-origin"] == "http://localhost:5173"
+
+        response = client.get("/health", headers={"Origin": "http://evil.example.com"})
+        assert "access-control-allow-origin" not in response.headers
+
+    def test_static_model_files(self, tmp_path):
+        """Test that generated files are served statically and other output files are not."""
+        from fastapi import FastAPI
+        from app.main import GeneratedFiles
+
+        # The app serves OUTPUT_DIR through GeneratedFiles at /static/models
+        mount = next(route for route in app.routes if getattr(route, "path", None) == "/static/models")
+        assert isinstance(mount.app, GeneratedFiles)
+
+        # Serve a temporary directory the same way, so the test never touches the real output
+        (tmp_path / "static-test-model.stl").write_bytes(b"solid test\nendsolid test\n")
+        (tmp_path / "models.db").write_bytes(b"not served")
+        files_app = FastAPI()
+        files_app.mount("/static/models", GeneratedFiles(directory=tmp_path), name="models")
+        files_client = TestClient(files_app)
+
+        response = files_client.get("/static/models/static-test-model.stl")
+        assert response.status_code == 200
+        assert response.content == b"solid test\nendsolid test\n"
+
+        response = files_client.get("/static/models/models.db")
+        assert response.status_code == 404
+
     @patch('app.api.routes.simulation.simulation_manager')
     @patch('app.api.routes.simulation.ParameterAdapter')
-    def test_start_simulation_endpoint(self, mock_adapter, mock_manager, client, sample_simulation_request):
+    def test_start_simulation_endpoint(self, mock_adapter, mock_manager, client, sample_simulation_payload):
         """Test simulation start endpoint - exercises pydantic, fastapi, and simulation imports."""
         # Mock parameter validation
         mock_adapter.validate_web_parameters.return_value = []
@@ -112,7 +243,7 @@ class TestAPIEndpoints:
         # Mock simulation manager
         mock_manager.start_simulation.return_value = "test-job-123"
         
-        response = client.post("/api/simulate", json=sample_simulation_request.dict())
+        response = client.post("/api/simulate", json=sample_simulation_payload)
         assert response.status_code == 200
         data = response.json()
         assert data["job_id"] == "test-job-123"
@@ -124,27 +255,10 @@ class TestAPIEndpoints:
     def test_get_simulation_status_endpoint(self, mock_psutil, mock_manager, client, mock_simulation_job):
         """Test simulation status endpoint - exercises psutil and simulation manager imports."""
         # Mock psutil calls
-        mock_memory = Mock()
-        mock_memory.total = 8 * 1024**3  # 8GB
-        mock_memory.available = 4 * 1024**3  # 4GB
-        mock_memory.percent = 50.0
-        mock_psutil.virtual_memory.return_value = mock_memory
+        mock_psutil.virtual_memory.return_value = MOCK_MEMORY
         mock_psutil.cpu_percent.return_value = 25.0
-        
-        mock_disk = Mock()
-        mock_disk.free = 100 * 1024**3  # 100GB
-        mock_disk.total = 500 * 1024**3  # 500GB
-        mock_disk.used = 400 * 1024**3   # 400GB
-        mock_psutil.disk_usage.return_value = mock_disk
-        
-        mock_process = Mock()
-        mock_process_memory = Mock()
-        mock_process_memory.rss = 100 * 1024**2  # 100MB
-        mock_process_memory.vms = 200 * 1024**2  # 200MB
-        mock_process.memory_info.return_value = mock_process_memory
-        mock_process.pid = 1234
-        mock_process.num_threads.return_value = 8
-        mock_psutil.Process.return_value = mock_process
+        mock_psutil.disk_usage.return_value = MOCK_DISK
+        mock_psutil.Process.return_value = MOCK_PROCESS
         
         # Mock simulation manager
         mock_manager.get_job_status.return_value = mock_simulation_job
@@ -178,23 +292,14 @@ class TestAPIEndpoints:
         assert "mesh_quality" in data
 
     @patch('app.api.routes.simulation.simulation_manager')
-    @patch('app.api.routes.simulation.os.path.exists')
-    def test_get_simulation_preview_endpoint(self, mock_exists, mock_manager, client, mock_simulation_job):
+    def test_get_simulation_preview_endpoint(self, mock_manager, client, mock_simulation_job, sample_files):
         """Test simulation preview endpoint - exercises file response and os imports."""
+        mock_simulation_job.result_files = sample_files
         mock_manager.get_job_status.return_value = mock_simulation_job
-        mock_exists.return_value = True
         
-        # Create a temporary file to serve
-        with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp_file:
-            tmp_file.write(b"fake image data")
-            mock_simulation_job.result_files["jpg"] = tmp_file.name
-            
-            response = client.get("/api/simulate/test-job-123/preview")
-            assert response.status_code == 200
-            assert response.headers["content-type"] == "image/jpeg"
-            
-            # Clean up
-            os.unlink(tmp_file.name)
+        response = client.get("/api/simulate/test-job-123/preview")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/jpeg"
 
     @patch('app.api.routes.simulation.simulation_manager')
     def test_cancel_simulation_endpoint(self, mock_manager, client):
@@ -206,42 +311,21 @@ class TestAPIEndpoints:
         data = response.json()
         assert "Cancellation requested" in data["message"]
 
+    @pytest.mark.parametrize("file_type,content_type", [
+        ("stl", "application/octet-stream"),
+        ("json", "application/json"),
+        ("jpg", "image/jpeg"),
+    ])
     @patch('app.api.routes.simulation.simulation_manager')
-    @patch('app.api.routes.simulation.os.path.exists')
-    def test_download_simulation_file_endpoint(self, mock_exists, mock_manager, client, mock_simulation_job):
+    def test_download_simulation_file_endpoint(self, mock_manager, client, mock_simulation_job, sample_files, file_type, content_type):
         """Test file download endpoint - exercises file response and os imports."""
+        mock_simulation_job.result_files = sample_files
         mock_manager.get_job_status.return_value = mock_simulation_job
-        mock_exists.return_value = True
-        
-        # Create temporary files for each file type
-        file_types = ["stl", "json", "jpg"]
-        temp_files = {}
-        
-        try:
-            for file_type in file_types:
-                with tempfile.NamedTemporaryFile(suffix=f'.{file_type}', delete=False) as tmp_file:
-                    tmp_file.write(f"fake {file_type} data".encode())
-                    temp_files[file_type] = tmp_file.name
-                    mock_simulation_job.result_files[file_type] = tmp_file.name
-            
-            # Test each file type download
-            for file_type in file_types:
-                response = client.get(f"/api/simulate/test-job-123/download/{file_type}")
-                assert response.status_code == 200
-                
-                # Verify content type
-                if file_type == "stl":
-                    assert response.headers["content-type"] == "application/octet-stream"
-                elif file_type == "json":
-                    assert response.headers["content-type"] == "application/json"
-                elif file_type == "jpg":
-                    assert response.headers["content-type"] == "image/jpeg"
         
-        finally:
-            # Clean up temporary files
-            for file_path in temp_files.values():
-                if os.path.exists(file_path):
-                    os.unlink(file_path)
+        response = client.get(f"/api/simulate/test-job-123/download/{file_type}")
+        assert response.status_code == 200
+        assert response.content == f"fake {file_type} data".encode()
+        assert response.headers["content-type"] == content_type
 
     @patch('app.api.routes.simulation.simulation_manager')
     def test_list_jobs_endpoint(self, mock_manager, client):
@@ -313,33 +397,76 @@ class TestAPIEndpoints:
         # Should get validation error (422 for pydantic validation or 400 for custom validation)
         assert response.status_code in [400, 422]
 
+    def test_simulation_parameters_speed_range_and_immutability(self):
+        """Test speed min/max cross-validation and that parameters are frozen."""
+        from pydantic import ValidationError
+
+        with pytest.raises(ValidationError, match="Speed minimum must be less than or equal"):
+            SimulationParameters(speed_min=2.0, speed_max=1.0)
+
+        parameters = SimulationParameters(speed_min=0.5, speed_max=2.0)
+        with pytest.raises(ValidationError):
+            parameters.steps = 10
+
+    @pytest.mark.parametrize("endpoint", [
+        "/api/simulate/nonexistent/status",
+        "/api/simulate/nonexistent/result",
+        "/api/simulate/nonexistent/preview"
+    ])
     @patch('app.api.routes.simulation.simulation_manager')
-    def test_job_not_found_scenarios(self, mock_manager, client):
+    def test_job_not_found_scenarios(self, mock_manager, client, endpoint):
         """Test job not found scenarios - exercises error handling paths."""
         mock_manager.get_job_status.return_value = None
         
-        # Test various endpoints with non-existent job
-        endpoints = [
-            "/api/simulate/nonexistent/status",
-            "/api/simulate/nonexistent/result",
-            "/api/simulate/nonexistent/preview"
-        ]
-        
-        for endpoint in endpoints:
-            response = client.get(endpoint)
-            assert response.status_code == 404
-            data = response.json()
-            assert data["error"] == "Job not found"
+        response = client.get(endpoint)
+        assert response.status_code == 404
+        data = response.json()
+        assert data["error"] == "Job not found"
 
     def test_global_exception_handler(self, client):
         """Test global exception handler - exercises logging and traceback imports."""
-        # This test would require triggering an unhandled exception
-        # For now, we verify the handler exists by checking it's registered
-        from app.main import app
-        
-        # Check that the global exception handler is registered
-        assert hasattr(app, 'exception_handlers')
-        assert Exception in app.exception_handlers
+        from app.main import app, ErrorLoggingMiddleware
+
+        # Check that the error logging middleware is registered
+        assert any(middleware.cls is ErrorLoggingMiddleware for middleware in app.user_middleware)
+
+    def test_error_logging_middleware_returns_json_500(self):
+        """Test that unhandled exceptions are turned into a JSON 500 response."""
+        from app.main import ErrorLoggingMiddleware
+
+        async def failing_app(scope, receive, send):
+            raise RuntimeError("boom")
+
+        response = TestClient(ErrorLoggingMiddleware(failing_app)).get("/anything")
+        assert response.status_code == 500
+        data = response.json()
+        assert data["error"] == "Internal server error"
+        assert data["error_type"] == "RuntimeError"
+        # Request details are withheld unless DEBUG logging is enabled
+        assert data["request_info"] is None
+
+
+class TestProgressReporter:
+    """Tests for batching of WebSocket progress updates."""
+
+    def test_queued_progress_updates_are_batched(self):
+        """Test that queued updates are sent together, capped at the batch size."""
+        from app.core.progress_reporter import ProgressReporter, PROGRESS_BATCH_MAX_SIZE
+
+        async def collect_batches():
+            reporter = ProgressReporter()
+            queue = asyncio.Queue()
+            for step in range(PROGRESS_BATCH_MAX_SIZE + 3):
+                queue.put_nowait({"type": "progress", "step": step})
+            first = await reporter._collect_progress_batch(queue)
+            second = await reporter._collect_progress_batch(queue)
+            return first, second
+
+        first, second = asyncio.run(collect_batches())
+        assert len(first) == PROGRESS_BATCH_MAX_SIZE
+        assert [message["step"] for message in second] == [
+            PROGRESS_BATCH_MAX_SIZE, PROGRESS_BATCH_MAX_SIZE + 1, PROGRESS_BATCH_MAX_SIZE + 2
+        ]
 
 
 class TestImportExercise:
@@ -370,55 +497,22 @@ class TestImportExercise:
         assert issubclass(SimulationRequest, BaseModel)
         assert issubclass(SimulationParameters, BaseModel)
 
-    def test_uvicorn_import(self):
-        """Test uvicorn import availability."""
-        import uvicorn
-        assert hasattr(uvicorn, 'run')
-
-    def test_websockets_import(self):
-        """Test websockets import availability."""
-        import websockets
-        assert hasattr(websockets, 'serve')
-
-    def test_trimesh_import_availability(self):
-        """Test that trimesh is available for import."""
-        try:
-            import trimesh
-            assert hasattr(trimesh, 'Trimesh')
-        except ImportError:
-            pytest.fail("trimesh import failed - missing dependency")
-
-    def test_pillow_import_availability(self):
-        """Test that Pillow is available for import."""
-        try:
-            from PIL import Image
-            assert hasattr(Image, 'open')
-        except ImportError:
-            pytest.fail("Pillow import failed - missing dependency")
-
-    def test_scipy_import_availability(self):
-        """Test that scipy is available for import."""
-        try:
-            import scipy
-            assert hasattr(scipy, 'version')
-        except ImportError:
-            pytest.fail("scipy import failed - missing dependency")
-
-    def test_numpy_stl_import_availability(self):
-        """Test that numpy-stl is available for import."""
-        try:
-            import stl
-            assert hasattr(stl, 'mesh')
-        except ImportError:
-            pytest.fail("numpy-stl import failed - missing dependency")
-
-    def test_scikit_image_import_availability(self):
-        """Test that scikit-image is available for import."""
+    @pytest.mark.parametrize("module,attribute", [
+        ("uvicorn", "run"),
+        ("websockets", "serve"),
+        ("trimesh", "Trimesh"),
+        ("PIL.Image", "open"),
+        ("scipy", "version"),
+        ("stl", "mesh"),
+        ("skimage.measure", "marching_cubes"),
+    ])
+    def test_dependency_import_availability(self, module, attribute):
+        """Test that a runtime dependency is available for import."""
         try:
-            from skimage import measure
-            assert hasattr(measure, 'marching_cubes')
+            imported = importlib.import_module(module)
         except ImportError:
-            pytest.fail("scikit-image import failed - missing dependency")
+            pytest.fail(f"{module} import failed - missing dependency")
+        assert hasattr(imported, attribute)
 
 
 if __name__ == "__main__":
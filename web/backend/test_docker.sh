@@ -28,11 +28,11 @@ fi
 
 # Install required Python packages
 echo "📦 Installing test dependencies..."
-pip3 install --user requests || pip3 install --break-system-packages requests || {
-    echo "❌ Failed to install requests package"
-    echo "💡 Please install requests manually:"
-    echo "   pip3 install --user requests"
-    echo "   OR: python3 -m venv venv && source venv/bin/activate && pip install requests"
+pip3 install --user httpx pytest || pip3 install --break-system-packages httpx pytest || {
+    echo "❌ Failed to install test packages"
+    echo "💡 Please install httpx and pytest manually:"
+    echo "   pip3 install --user httpx pytest"
+    echo "   OR: python3 -m venv venv && source venv/bin/activate && pip install httpx pytest"
     exit 1
 }
 
@@ -1,29 +1,153 @@
 # ABOUTME: Comprehensive test script for Docker container deployment verification
 # ABOUTME: Tests health, API endpoints, and core functionality of the containerized backend
 
-import requests
+import fcntl
+import httpx
+import orjson
+import pytest
 import time
 import json
 import subprocess
 import sys
 import os
-from typing import Dict, Any, Optional
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
 import tempfile
 
+from conftest import IMAGE_NAME, REPO_ROOT, current_image_tag, docker_available, image_exists
+
+CONTAINER_PORT = 8000
+
+# Leave the container running after the tests so the next session can reuse it;
+# set REUSE_TEST_CONTAINER=false to always start fresh and stop it afterwards
+REUSE_CONTAINER = os.getenv("REUSE_TEST_CONTAINER", "true").lower() == "true"
+
+# Smallest simulation the API accepts; it only exercises the job plumbing in
+# the container, so it finishes in a fraction of a second
+SMOKE_SIMULATION_PARAMETERS = {
+    "width": 16,
+    "height": 16,
+    "actors": 5,
+    "steps": 5,
+    "initial_diameter": 4,
+    "layer_frequency": 1,
+}
+
+# The request body never changes, so serialize it once
+SMOKE_SIMULATION_BODY = orjson.dumps({"parameters": SMOKE_SIMULATION_PARAMETERS})
+JSON_HEADERS = {"Content-Type": "application/json"}
+
 class DockerDeploymentTester:
-    def __init__(self, container_name: str = "physarum-test", port: int = 8001):
+    def __init__(self, container_name: str = "physarum-test", port: Optional[int] = None, reuse: bool = REUSE_CONTAINER):
         self.container_name = container_name
+        # Without a fixed port Docker picks a free host port, read back after the container starts
         self.port = port
-        self.base_url = f"http://localhost:{port}"
+        self.base_url = f"http://localhost:{port}" if port else "http://localhost"
         self.container_id = None
+        self.reuse = reuse
+        self.image_tag = f"{IMAGE_NAME}:latest"
+        self.lock_path = Path(tempfile.gettempdir()) / f"{container_name}.lock"
+        # Every session using the container holds a shared lock on this file
+        self.users_path = Path(tempfile.gettempdir()) / f"{container_name}.users"
+        self.users_file = None
+        # One keep-alive client for the readiness poll and every probe
+        self.client = httpx.Client(base_url=self.base_url, timeout=10, follow_redirects=True)
+    
+    @contextmanager
+    def setup_lock(self):
+        """Hold an exclusive lock while building and starting the container.
+        
+        Concurrent test sessions wait here instead of rebuilding or restarting
+        the container underneath each other. The lock file records the owning
+        PID, and the kernel releases the lock if that process dies.
+        """
+        with open(self.lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            lock_file.write(str(os.getpid()))
+            lock_file.flush()
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def acquire_usage(self):
+        """Record that this session is using the container until release_usage."""
+        self.users_file = open(self.users_path, "a")
+        fcntl.flock(self.users_file, fcntl.LOCK_SH)
+    
+    def release_usage(self) -> bool:
+        """Stop using the container and report whether no other session still uses it.
+        
+        Call this while holding setup_lock, so two sessions finishing together
+        cannot both see the other as still active.
+        """
+        if self.users_file is None:
+            return not self.container_in_use()
+        try:
+            fcntl.flock(self.users_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+        finally:
+            self.users_file.close()
+            self.users_file = None
+    
+    def container_in_use(self) -> bool:
+        """Check whether another session, such as a pytest-xdist worker, is using the container."""
+        with open(self.users_path, "a") as users_file:
+            try:
+                fcntl.flock(users_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(users_file, fcntl.LOCK_UN)
+            return False
+    
+    def container_state(self) -> Optional[Tuple[bool, str, str, str]]:
+        """Return whether the test container is running, its Docker health status, its image and its ID.
+        
+        The health status is "none" for images built without a HEALTHCHECK, and
+        None is returned when the container does not exist.
+        """
+        result = subprocess.run(
+            [
+                "docker", "inspect", "-f",
+                "{{.State.Running}} {{if .State.Health}}{{.State.Health.Status}}{{else}}none{{end}} {{.Config.Image}} {{.Id}}",
+                self.container_name
+            ],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            return None
+        running, health, image, container_id = result.stdout.split()
+        return running == "true", health, image, container_id
+    
+    def remove_container(self):
+        """Stop and remove the test container in a single docker call."""
+        subprocess.run(["docker", "rm", "-f", self.container_name], capture_output=True)
         
     def build_image(self) -> bool:
-        """Build the Docker image."""
+        """Build the Docker image, reusing the existing one when it is up to date."""
         print("🔨 Building Docker image...")
         try:
+            self.image_tag = current_image_tag()
+            if image_exists(self.image_tag):
+                print(f"✅ Docker image {self.image_tag} is up to date, skipping build")
+                return True
+            
+            # BuildKit embeds cache metadata in the image so the next build can
+            # reuse its layers through --cache-from. --quiet keeps the step-by-step
+            # log out of memory; a failed build still reports its error on stderr
             result = subprocess.run(
-                ["docker", "build", "-t", "physarum-backend", "."],
-                capture_output=True, text=True, timeout=300
+                [
+                    "docker", "build", "--quiet",
+                    "--build-arg", "BUILDKIT_INLINE_CACHE=1",
+                    "--cache-from", f"{IMAGE_NAME}:latest",
+                    "-t", self.image_tag,
+                    "-t", f"{IMAGE_NAME}:latest", "."
+                ],
+                capture_output=True, text=True, timeout=300,
+                cwd=REPO_ROOT, env={**os.environ, "DOCKER_BUILDKIT": "1"}
             )
             if result.returncode != 0:
                 print(f"❌ Build failed: {result.stderr}")
@@ -39,18 +163,33 @@ class DockerDeploymentTester:
     
     def start_container(self) -> bool:
         """Start the Docker container."""
-        print(f"🚀 Starting container on port {self.port}...")
+        print("🚀 Starting container...")
         try:
+            state = self.container_state()
+            
+            # A container another session is still using is never restarted
+            if state and (self.reuse or self.container_in_use()):
+                running, health, image, container_id = state
+                # A container started from a different image cannot be reused.
+                # Docker's HEALTHCHECK already says whether the app is up; only
+                # ask the app itself when Docker has not reported healthy
+                if running and image == self.image_tag and self.use_published_port() and (
+                    health == "healthy" or self.wait_until_ready(deadline=1.0)
+                ):
+                    self.container_id = container_id
+                    print(f"✅ Reusing running container: {container_id[:12]}")
+                    return True
+            
             # Stop and remove existing container if it exists
-            subprocess.run(["docker", "stop", self.container_name], capture_output=True)
-            subprocess.run(["docker", "rm", self.container_name], capture_output=True)
+            if state:
+                self.remove_container()
             
             # Start new container
             result = subprocess.run([
                 "docker", "run", "-d", 
-                "-p", f"{self.port}:8000",
+                "-p", f"{self.port}:{CONTAINER_PORT}" if self.port else str(CONTAINER_PORT),
                 "--name", self.container_name,
-                "physarum-backend"
+                self.image_tag
             ], capture_output=True, text=True)
             
             if result.returncode != 0:
@@ -58,23 +197,64 @@ class DockerDeploymentTester:
                 return False
                 
             self.container_id = result.stdout.strip()
-            print(f"✅ Container started: {self.container_id[:12]}")
+            if not self.use_published_port():
+                print("❌ Could not read the container's published port")
+                return False
+            print(f"✅ Container started: {self.container_id[:12]} on port {self.port}")
             
             # Wait for container to be ready
             print("⏳ Waiting for container to be ready...")
-            time.sleep(5)
+            if not self.wait_until_ready():
+                print("❌ Container did not become healthy in time")
+                return False
             return True
             
         except Exception as e:
             print(f"❌ Container start error: {e}")
             return False
     
+    def use_published_port(self) -> bool:
+        """Point the client at the host port Docker published for the app."""
+        result = subprocess.run(
+            ["docker", "port", self.container_name, f"{CONTAINER_PORT}/tcp"],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0 or not result.stdout.strip():
+            return False
+        # One line per address family, e.g. "0.0.0.0:49153"; the port is the same on each
+        self.port = int(result.stdout.splitlines()[0].rsplit(":", 1)[1])
+        self.base_url = f"http://localhost:{self.port}"
+        self.client.base_url = self.base_url
+        return True
+    
+    def wait_until_ready(self, deadline: float = 30.0) -> bool:
+        """Poll /health with exponential backoff until the app reports healthy.
+        
+        The delay starts at 50ms and is capped at 1s, so a slow start is still
+        noticed within a second of the app becoming healthy.
+        """
+        start = time.monotonic()
+        delay = 0.05
+        while True:
+            try:
+                response = self.client.get("/health", timeout=1)
+                if response.status_code == 200 and response.json().get("status") == "healthy":
+                    print(f"✅ Container ready after {time.monotonic() - start:.1f}s")
+                    return True
+            except httpx.HTTPError:
+                pass  # Server is not accepting connections yet
+            
+            remaining = deadline - (time.monotonic() - start)
+            if remaining <= 0:
+                return False
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 1.0)
+    
     def stop_container(self):
         """Stop and clean up the container."""
         if self.container_name:
             print("🛑 Stopping container...")
-            subprocess.run(["docker", "stop", self.container_name], capture_output=True)
-            subprocess.run(["docker", "rm", self.container_name], capture_output=True)
+            self.remove_container()
     
     def get_container_logs(self) -> str:
         """Get container logs for debugging."""
@@ -85,194 +265,83 @@ class DockerDeploymentTester:
             return result.stdout + result.stderr
         except Exception:
             return "Could not retrieve logs"
+
+
+# Checked once at collection, so without Docker every test is skipped up front
+pytestmark = pytest.mark.skipif(not docker_available(), reason="Docker is not available")
+
+@pytest.fixture(scope="session")
+def container():
+    """Build the image and run one container shared by every test in the session."""
+    # pytest-xdist workers share one container: the first worker to take the
+    # setup lock starts it, the others attach to it, and only the last one to
+    # finish removes it
+    tester = DockerDeploymentTester()
+    try:
+        with tester.setup_lock():
+            if not (tester.build_image() and tester.start_container()):
+                pytest.fail(f"Container setup failed, logs:\n{tester.get_container_logs()}")
+            tester.acquire_usage()
+        yield tester
+    finally:
+        tester.client.close()
+        with tester.setup_lock():
+            if tester.release_usage() and not tester.reuse:
+                tester.stop_container()
+
+@pytest.fixture(scope="session")
+def http_client(container):
+    """HTTP client for the running container, following redirects like a browser."""
+    return container.client
+
+def test_health_endpoint(http_client):
+    """Test the /health endpoint."""
+    response = http_client.get("/health")
+    assert response.status_code == 200
+    assert response.json().get("status") == "healthy"
+
+@pytest.mark.parametrize("endpoint", [
+    "/health",
+    "/docs",  # FastAPI docs
+    "/api/models",  # Models endpoint
+])
+def test_api_endpoint_available(http_client, endpoint):
+    """Test basic API endpoint availability."""
+    response = http_client.get(endpoint)
+    # 422 is OK for some endpoints without params
+    assert response.status_code in [200, 422]
+
+def test_cors_headers(http_client):
+    """Test CORS headers are properly configured."""
+    response = http_client.options("/health", headers={
+        "Origin": "http://localhost:3000",
+        "Access-Control-Request-Method": "GET"
+    })
+    assert response.headers.get("Access-Control-Allow-Origin")
+
+def test_simulation_endpoint_basic(http_client):
+    """Test simulation endpoint accepts a request and starts the smallest possible job."""
+    response = http_client.post(
+        "/api/simulate", content=SMOKE_SIMULATION_BODY, headers=JSON_HEADERS, timeout=30
+    )
     
-    def test_health_endpoint(self) -> bool:
-        """Test the /health endpoint."""
-        print("🏥 Testing health endpoint...")
-        try:
-            response = requests.get(f"{self.base_url}/health", timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("status") == "healthy":
-                    print("✅ Health check passed")
-                    return True
-                else:
-                    print(f"❌ Health check failed: {data}")
-                    return False
-            else:
-                print(f"❌ Health endpoint returned {response.status_code}")
-                return False
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Health check connection failed: {e}")
-            return False
-    
-    def test_api_endpoints(self) -> bool:
-        """Test basic API endpoint availability."""
-        print("🔌 Testing API endpoints...")
-        
-        endpoints = [
-            ("/health", "GET"),
-            ("/docs", "GET"),  # FastAPI docs
-            ("/api/models", "GET"),  # Models endpoint
-        ]
-        
-        for endpoint, method in endpoints:
-            try:
-                if method == "GET":
-                    response = requests.get(f"{self.base_url}{endpoint}", timeout=10)
-                else:
-                    continue  # Skip non-GET for now
-                
-                if response.status_code in [200, 422]:  # 422 is OK for some endpoints without params
-                    print(f"✅ {endpoint} responded ({response.status_code})")
-                else:
-                    print(f"❌ {endpoint} failed ({response.status_code})")
-                    return False
-                    
-            except requests.exceptions.RequestException as e:
-                print(f"❌ {endpoint} connection failed: {e}")
-                return False
-        
-        return True
-    
-    def test_cors_headers(self) -> bool:
-        """Test CORS headers are properly configured."""
-        print("🌐 Testing CORS configuration...")
-        try:
-            response = requests.options(f"{self.base_url}/health", headers={
-                "Origin": "http://localhost:3000",
-                "Access-Control-Request-Method": "GET"
-            }, timeout=10)
-            
-            cors_headers = {
-                "Access-Control-Allow-Origin": response.headers.get("Access-Control-Allow-Origin"),
-                "Access-Control-Allow-Methods": response.headers.get("Access-Control-Allow-Methods"),
-            }
-            
-            if cors_headers["Access-Control-Allow-Origin"]:
-                print("✅ CORS headers present")
-                return True
-            else:
-                print("❌ CORS headers missing")
-                return False
-                
-        except requests.exceptions.RequestException as e:
-            print(f"❌ CORS test failed: {e}")
-            return False
-    
-    def test_simulation_endpoint_basic(self) -> bool:
-        """Test simulation endpoint accepts requests (without actually running simulation)."""
-        print("⚡ Testing simulation endpoint...")
-        try:
-            # Test with minimal valid parameters
-            test_data = {
-                "image_data": "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8/5+hHgAHggJ/PchI7wAAAABJRU5ErkJggg==",
-                "parameters": {
-                    "num_agents": 100,
-                    "num_iterations": 10,
-                    "diffusion_rate": 0.1,
-                    "evaporation_rate": 0.1
-                }
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/api/simulation/run", 
-                json=test_data,
-                timeout=30
-            )
-            
-            # We expect this to either start processing (200/202) or give validation error (422)
-            if response.status_code in [200, 202, 422]:
-                print("✅ Simulation endpoint accepts requests")
-                return True
-            else:
-                print(f"❌ Simulation endpoint failed: {response.status_code} - {response.text}")
-                return False
-                
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Simulation endpoint test failed: {e}")
-            return False
-    
-    def test_models_endpoint(self) -> bool:
-        """Test models listing endpoint."""
-        print("📋 Testing models endpoint...")
-        try:
-            response = requests.get(f"{self.base_url}/api/models", timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                print(f"✅ Models endpoint returned {len(data)} models")
-                return True
-            else:
-                print(f"❌ Models endpoint failed: {response.status_code}")
-                return False
-                
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Models endpoint test failed: {e}")
-            return False
-    
-    def test_websocket_endpoint(self) -> bool:
-        """Test WebSocket endpoint is available."""
-        print("🔌 Testing WebSocket endpoint availability...")
-        # Note: This is a basic test - we're not testing actual WebSocket functionality
-        # Just checking that the endpoint doesn't return a 404
-        try:
-            response = requests.get(f"{self.base_url}/ws/test-job-id", timeout=5)
-            # WebSocket endpoints typically return 426 (Upgrade Required) for HTTP requests
-            if response.status_code in [426, 400]:
-                print("✅ WebSocket endpoint is available")
-                return True
-            else:
-                print(f"❌ WebSocket endpoint unexpected response: {response.status_code}")
-                return False
-                
-        except requests.exceptions.RequestException as e:
-            print(f"❌ WebSocket endpoint test failed: {e}")
-            return False
-    
-    def run_all_tests(self) -> bool:
-        """Run all tests and return overall success."""
-        print("🧪 Starting Docker deployment tests...\n")
-        
-        tests = [
-            ("Build Image", self.build_image),
-            ("Start Container", self.start_container),
-            ("Health Check", self.test_health_endpoint),
-            ("API Endpoints", self.test_api_endpoints),
-            ("CORS Headers", self.test_cors_headers),
-            ("Models Endpoint", self.test_models_endpoint),
-            ("Simulation Endpoint", self.test_simulation_endpoint_basic),
-            ("WebSocket Endpoint", self.test_websocket_endpoint),
-        ]
-        
-        passed = 0
-        total = len(tests)
-        
-        try:
-            for test_name, test_func in tests:
-                print(f"\n--- {test_name} ---")
-                if test_func():
-                    passed += 1
-                else:
-                    print(f"💥 {test_name} failed!")
-                    print("📋 Container logs:")
-                    print(self.get_container_logs())
-                    break
-                    
-        finally:
-            self.stop_container()
-        
-        print(f"\n{'='*50}")
-        print(f"🧪 Test Results: {passed}/{total} tests passed")
-        
-        if passed == total:
-            print("🎉 All Docker deployment tests PASSED!")
-            print("✅ Backend is ready for Railway deployment")
-            return True
-        else:
-            print("❌ Some tests FAILED!")
-            print("🔧 Fix issues before deploying to Railway")
-            return False
+    # We expect this to start processing (200/202)
+    assert response.status_code in [200, 202], response.text
+    assert response.json().get("job_id")
+
+def test_models_endpoint(http_client):
+    """Test models listing endpoint."""
+    response = http_client.get("/api/models")
+    assert response.status_code == 200
+    response.json()
+
+def test_websocket_endpoint(http_client):
+    """Test WebSocket endpoint is available."""
+    # Note: This is a basic test - we're not testing actual WebSocket functionality
+    # Just checking that the endpoint doesn't return a 404
+    response = http_client.get("/ws/test-job-id", timeout=5)
+    # WebSocket endpoints typically return 426 (Upgrade Required) for HTTP requests
+    assert response.status_code in [426, 400]
 
 def main():
     """Main entry point."""
@@ -280,10 +349,7 @@ def main():
     backend_dir = os.path.dirname(os.path.abspath(__file__))
     os.chdir(backend_dir)
     
-    tester = DockerDeploymentTester()
-    success = tester.run_all_tests()
-    
-    sys.exit(0 if success else 1)
+    sys.exit(pytest.main([__file__, "-v"]))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,289 +1,332 @@
 # ABOUTME: Integration tests for model registry API endpoints
 # ABOUTME: Tests the FastAPI routes for listing, downloading, and managing models
 
-import unittest
-import tempfile
+import pytest
+import asyncio
+import httpx
 import os
-import json
-import shutil
+import orjson
+import sqlite3
 import time
+from pathlib import Path
 from fastapi.testclient import TestClient
-from unittest.mock import patch
 
 from app.main import app
+from app.api.routes.models import get_model_registry
 from app.core.model_registry import ModelRegistry, ModelRecord
 
 
-class TestModelAPI(unittest.TestCase):
+# Shared-cache in-memory database, private to each test process
+DB_URI = "file:test_model_api?mode=memory&cache=shared"
+
+# Metadata files for the test models, serialized once; scanning hashes them into model IDs
+TEST_JSON_CONTENT = {
+    model_id: orjson.dumps({"model_id": model_id, "test": True})
+    for model_id in ("test_cli_model", "test_web_model")
+}
+
+# Update request bodies never change, so serialize them once
+UPDATE_BODY = orjson.dumps({"name": "Updated CLI Model", "favorite": False, "tags": ["updated", "test"]})
+RENAME_BODY = orjson.dumps({"name": "New Name"})
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+@pytest.fixture(scope="module")
+def client():
+    """Create test client for API testing, shared by the tests in this module."""
+    return TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def registry_db():
+    """Keeper connection; the in-memory database lives as long as it stays open."""
+    conn = sqlite3.connect(DB_URI, uri=True)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(scope="module")
+def registry(registry_db, tmp_path_factory):
+    """Temporary registry injected into the model routes, shared by the module."""
+    test_registry = ModelRegistry(output_dir=str(tmp_path_factory.mktemp("output")), db_path=DB_URI)
+
+    async def use_test_registry():
+        return test_registry
+
+    app.dependency_overrides[get_model_registry] = use_test_registry
+    yield test_registry
+    app.dependency_overrides.pop(get_model_registry)
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry(registry, registry_db):
+    """Reset the registry to the two test models before each test."""
+    # Tests update, delete and scan models, so start each from an empty table
+    with registry_db:
+        registry_db.execute("DELETE FROM models")
+    create_test_models(registry)
+    return registry
+
+
+def create_test_models(registry: ModelRegistry):
+    """Create test models for testing."""
+    output_dir = registry.output_dir
+
+    # CLI model
+    cli_model = ModelRecord(
+        id="test_cli_model",
+        created_at=time.time() - 3600,  # 1 hour ago
+        name="CLI Test Model",
+        stl_path=str(output_dir / "cli_model.stl"),
+        json_path=str(output_dir / "cli_model.json"),
+        jpg_path=str(output_dir / "cli_model.jpg"),
+        parameters={"width": 256, "height": 256, "steps": 100, "actors": 50},
+        source="cli",
+        git_commit="abc123def456",
+        file_sizes={"stl": 2048, "json": 512, "jpg": 1024},
+        favorite=True,
+        tags="test,cli"
+    )
+
+    # Web model
+    web_model = ModelRecord(
+        id="test_web_model",
+        created_at=time.time() - 1800,  # 30 minutes ago
+        name="Web Test Model",
+        stl_path=str(output_dir / "web_model.stl"),
+        json_path=str(output_dir / "web_model.json"),
+        parameters={"width": 128, "height": 128, "steps": 50, "actors": 25},
+        source="web",
+        file_sizes={"stl": 1024, "json": 256},
+        favorite=False,
+        tags="test,web"
+    )
+
+    # Create actual test files; only the JSON content is ever read
+    for model in [cli_model, web_model]:
+        if model.stl_path:
+            Path(model.stl_path).touch()
+        if model.json_path:
+            Path(model.json_path).write_bytes(TEST_JSON_CONTENT[model.id])
+        if model.jpg_path:
+            Path(model.jpg_path).touch()
+
+    # Register models
+    registry.register_models([cli_model, web_model])
+
+
+class TestModelAPI:
     """Integration tests for model registry API endpoints."""
-    
-    def setUp(self):
-        """Set up test environment with temporary registry."""
-        self.test_dir = tempfile.mkdtemp()
-        self.db_path = os.path.join(self.test_dir, "test_models.db")
-        self.output_dir = os.path.join(self.test_dir, "output")
-        os.makedirs(self.output_dir, exist_ok=True)
-        
-        # Create test registry
-        self.test_registry = ModelRegistry(output_dir=self.output_dir, db_path=self.db_path)
-        
-        # Patch the global registry with our test instance
-        self.registry_patcher = patch('app.api.routes.models.model_registry', self.test_registry)
-        self.registry_patcher.start()
-        
-        # Create test client
-        self.client = TestClient(app)
-        
-        # Add some test models
-        self._create_test_models()
-        
-    def tearDown(self):
-        """Clean up test environment."""
-        self.registry_patcher.stop()
-        if os.path.exists(self.test_dir):
-            shutil.rmtree(self.test_dir)
-    
-    def _create_test_models(self):
-        """Create test models for testing."""
-        # CLI model
-        cli_model = ModelRecord(
-            id="test_cli_model",
-            created_at=time.time() - 3600,  # 1 hour ago
-            name="CLI Test Model",
-            stl_path=os.path.join(self.output_dir, "cli_model.stl"),
-            json_path=os.path.join(self.output_dir, "cli_model.json"),
-            jpg_path=os.path.join(self.output_dir, "cli_model.jpg"),
-            parameters={"width": 256, "height": 256, "steps": 100, "actors": 50},
-            source="cli",
-            git_commit="abc123def456",
-            file_sizes={"stl": 2048, "json": 512, "jpg": 1024},
-            favorite=True,
-            tags="test,cli"
-        )
-        
-        # Web model
-        web_model = ModelRecord(
-            id="test_web_model",
-            created_at=time.time() - 1800,  # 30 minutes ago
-            name="Web Test Model",
-            stl_path=os.path.join(self.output_dir, "web_model.stl"),
-            json_path=os.path.join(self.output_dir, "web_model.json"),
-            parameters={"width": 128, "height": 128, "steps": 50, "actors": 25},
-            source="web",
-            file_sizes={"stl": 1024, "json": 256},
-            favorite=False,
-            tags="test,web"
-        )
-        
-        # Create actual test files
-        for model in [cli_model, web_model]:
-            if model.stl_path:
-                with open(model.stl_path, 'w') as f:
-                    f.write(f"dummy stl content for {model.id}")
-            if model.json_path:
-                with open(model.json_path, 'w') as f:
-                    json.dump({"model_id": model.id, "test": True}, f)
-            if model.jpg_path:
-                with open(model.jpg_path, 'w') as f:
-                    f.write(f"dummy jpg content for {model.id}")
-        
-        # Register models
-        self.test_registry.register_model(cli_model)
-        self.test_registry.register_model(web_model)
-    
-    def test_list_models_all(self):
+
+    def test_list_models_all(self, client):
         """Test listing all models."""
-        response = self.client.get("/api/models/")
-        self.assertEqual(response.status_code, 200)
-        
+        response = client.get("/api/models/")
+        assert response.status_code == 200
+
         data = response.json()
-        self.assertTrue(data["success"])
-        self.assertEqual(len(data["data"]["models"]), 2)
-        self.assertEqual(data["data"]["total_count"], 2)
-        
+        assert data["success"]
+        assert len(data["data"]["models"]) == 2
+        assert data["data"]["total_count"] == 2
+
         # Check model data structure
         model = data["data"]["models"][0]  # Should be most recent (web model)
-        self.assertIn("id", model)
-        self.assertIn("name", model)
-        self.assertIn("source", model)
-        self.assertIn("parameters", model)
-        self.assertIn("favorite", model)
-        self.assertIn("tags", model)
-    
-    def test_list_models_with_source_filter(self):
+        assert {"id", "name", "source", "parameters", "favorite", "tags"} <= model.keys()
+
+    @pytest.mark.parametrize("source", ["cli", "web"])
+    def test_list_models_with_source_filter(self, client, source):
         """Test listing models filtered by source."""
-        # Test CLI filter
-        response = self.client.get("/api/models/?source=cli")
-        self.assertEqual(response.status_code, 200)
-        
-        data = response.json()
-        self.assertTrue(data["success"])
-        self.assertEqual(len(data["data"]["models"]), 1)
-        self.assertEqual(data["data"]["models"][0]["source"], "cli")
-        
-        # Test web filter
-        response = self.client.get("/api/models/?source=web")
-        self.assertEqual(response.status_code, 200)
-        
+        response = client.get(f"/api/models/?source={source}")
+        assert response.status_code == 200
+
         data = response.json()
-        self.assertEqual(len(data["data"]["models"]), 1)
-        self.assertEqual(data["data"]["models"][0]["source"], "web")
-    
-    def test_list_models_favorites_only(self):
+        assert data["success"]
+        assert len(data["data"]["models"]) == 1
+        assert data["data"]["models"][0]["source"] == source
+
+    def test_list_models_favorites_only(self, client):
         """Test listing only favorite models."""
-        response = self.client.get("/api/models/?favorites=true")
-        self.assertEqual(response.status_code, 200)
-        
+        response = client.get("/api/models/?favorites=true")
+        assert response.status_code == 200
+
         data = response.json()
-        self.assertTrue(data["success"])
-        self.assertEqual(len(data["data"]["models"]), 1)
-        self.assertTrue(data["data"]["models"][0]["favorite"])
-        self.assertEqual(data["data"]["models"][0]["id"], "test_cli_model")
-    
-    def test_list_models_with_pagination(self):
+        assert data["success"]
+        assert len(data["data"]["models"]) == 1
+        assert data["data"]["models"][0]["favorite"]
+        assert data["data"]["models"][0]["id"] == "test_cli_model"
+
+    def test_list_models_with_pagination(self, client):
         """Test model listing with pagination."""
-        response = self.client.get("/api/models/?limit=1&offset=0")
-        self.assertEqual(response.status_code, 200)
-        
+        response = client.get("/api/models/?limit=1&offset=0")
+        assert response.status_code == 200
+
         data = response.json()
-        self.assertEqual(len(data["data"]["models"]), 1)
-        self.assertEqual(data["data"]["returned_count"], 1)
-        self.assertTrue(data["data"]["has_more"])
-        
+        assert len(data["data"]["models"]) == 1
+        assert data["data"]["returned_count"] == 1
+        assert data["data"]["has_more"]
+
         # Get second page
-        response = self.client.get("/api/models/?limit=1&offset=1")
-        self.assertEqual(response.status_code, 200)
-        
+        response = client.get("/api/models/?limit=1&offset=1")
+        assert response.status_code == 200
+
         data = response.json()
-        self.assertEqual(len(data["data"]["models"]), 1)
-        self.assertFalse(data["data"]["has_more"])
-    
-    def test_get_specific_model(self):
+        assert len(data["data"]["models"]) == 1
+        assert not data["data"]["has_more"]
+
+    def test_get_specific_model(self, client):
         """Test getting a specific model by ID."""
-        response = self.client.get("/api/models/test_cli_model")
-        self.assertEqual(response.status_code, 200)
-        
+        response = client.get("/api/models/test_cli_model")
+        assert response.status_code == 200
+
         data = response.json()
-        self.assertTrue(data["success"])
-        
+        assert data["success"]
+
         model = data["data"]
-        self.assertEqual(model["id"], "test_cli_model")
-        self.assertEqual(model["name"], "CLI Test Model")
-        self.assertEqual(model["source"], "cli")
-        self.assertTrue(model["favorite"])
-        self.assertEqual(model["parameters"]["width"], 256)
-    
-    def test_get_nonexistent_model(self):
+        assert model["id"] == "test_cli_model"
+        assert model["name"] == "CLI Test Model"
+        assert model["source"] == "cli"
+        assert model["favorite"]
+        assert model["parameters"]["width"] == 256
+
+    def test_get_nonexistent_model(self, client):
         """Test getting a model that doesn't exist."""
-        response = self.client.get("/api/models/nonexistent")
-        self.assertEqual(response.status_code, 404)
-        
+        response = client.get("/api/models/nonexistent")
+        assert response.status_code == 404
+
         data = response.json()
-        self.assertIn("error", data["detail"])
-    
-    def test_update_model(self):
+        assert "error" in data["detail"]
+
+    def test_update_model(self, client):
         """Test updating model metadata."""
-        updates = {
-            "name": "Updated CLI Model",
-            "favorite": False,
-            "tags": ["updated", "test"]
-        }
-        
-        response = self.client.put("/api/models/test_cli_model", json=updates)
-        self.assertEqual(response.status_code, 200)
-        
+        response = client.put("/api/models/test_cli_model", content=UPDATE_BODY, headers=JSON_HEADERS)
+        assert response.status_code == 200
+
         # Verify update
-        response = self.client.get("/api/models/test_cli_model")
-        self.assertEqual(response.status_code, 200)
-        
+        response = client.get("/api/models/test_cli_model")
+        assert response.status_code == 200
+
         model = response.json()["data"]
-        self.assertEqual(model["name"], "Updated CLI Model")
-        self.assertFalse(model["favorite"])
-        self.assertIn("updated", model["tags"])
-    
-    def test_update_nonexistent_model(self):
+        assert model["name"] == "Updated CLI Model"
+        assert not model["favorite"]
+        assert "updated" in model["tags"]
+
+    def test_update_nonexistent_model(self, client):
         """Test updating a model that doesn't exist."""
-        updates = {"name": "New Name"}
-        
-        response = self.client.put("/api/models/nonexistent", json=updates)
-        self.assertEqual(response.status_code, 404)
-    
-    def test_download_model_file(self):
-        """Test downloading model files."""
-        # Test STL download
-        response = self.client.get("/api/models/test_cli_model/download/stl")
-        self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.headers["content-type"], "application/octet-stream")
-        
-        # Test JSON download
-        response = self.client.get("/api/models/test_cli_model/download/json")
-        self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.headers["content-type"], "application/json")
-        
-        # Test preview download
-        response = self.client.get("/api/models/test_cli_model/download/preview")
-        self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.headers["content-type"], "image/jpeg")
-    
-    def test_download_nonexistent_file(self):
+        response = client.put("/api/models/nonexistent", content=RENAME_BODY, headers=JSON_HEADERS)
+        assert response.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_download_model_file(self):
+        """Test downloading model files, all three at once on one event loop."""
+        content_types = {
+            "stl": "application/octet-stream",
+            "json": "application/json",
+            "preview": "image/jpeg",
+        }
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as async_client:
+            responses = await asyncio.gather(*(
+                async_client.get(f"/api/models/test_cli_model/download/{file_type}")
+                for file_type in content_types
+            ))
+
+        for response, content_type in zip(responses, content_types.values()):
+            assert response.status_code == 200
+            assert response.headers["content-type"] == content_type
+
+    def test_download_nonexistent_file(self, client):
         """Test downloading a file that doesn't exist."""
         # Web model doesn't have a preview file
-        response = self.client.get("/api/models/test_web_model/download/preview")
-        self.assertEqual(response.status_code, 404)
-    
-    def test_download_invalid_file_type(self):
+        response = client.get("/api/models/test_web_model/download/preview")
+        assert response.status_code == 404
+
+    def test_download_invalid_file_type(self, client):
         """Test downloading with invalid file type."""
-        response = self.client.get("/api/models/test_cli_model/download/invalid")
-        self.assertEqual(response.status_code, 400)
-        
+        response = client.get("/api/models/test_cli_model/download/invalid")
+        assert response.status_code == 400
+
         data = response.json()
-        self.assertIn("Invalid file type", data["detail"]["message"])
-    
-    def test_delete_model(self):
+        assert "Invalid file type" in data["detail"]["message"]
+
+    def test_delete_model(self, client):
         """Test deleting a model."""
-        response = self.client.delete("/api/models/test_web_model")
-        self.assertEqual(response.status_code, 200)
-        
+        response = client.delete("/api/models/test_web_model")
+        assert response.status_code == 200
+
         data = response.json()
-        self.assertIn("deleted from registry", data["message"])
-        
+        assert "deleted from registry" in data["message"]
+
         # Verify deletion
-        response = self.client.get("/api/models/test_web_model")
-        self.assertEqual(response.status_code, 404)
-    
-    def test_delete_model_with_files(self):
+        response = client.get("/api/models/test_web_model")
+        assert response.status_code == 404
+
+    def test_delete_model_with_files(self, client, fresh_registry):
         """Test deleting a model and its files."""
         # Verify files exist
-        self.assertTrue(os.path.exists(os.path.join(self.output_dir, "cli_model.stl")))
-        
-        response = self.client.delete("/api/models/test_cli_model?delete_files=true")
-        self.assertEqual(response.status_code, 200)
-        
+        assert os.path.exists(fresh_registry.output_dir / "cli_model.stl")
+
+        response = client.delete("/api/models/test_cli_model?delete_files=true")
+        assert response.status_code == 200
+
         data = response.json()
-        self.assertIn("files removed", data["message"])
-    
-    def test_scan_models(self):
+        assert "files removed" in data["message"]
+
+    def test_scan_models(self, client):
         """Test triggering a model scan."""
-        response = self.client.post("/api/models/scan")
-        self.assertEqual(response.status_code, 200)
-        
+        response = client.post("/api/models/scan")
+        assert response.status_code == 200
+
         data = response.json()
-        self.assertIn("Scan completed", data["message"])
-    
-    def test_get_statistics(self):
+        assert "Scan completed" in data["message"]
+
+    def test_get_statistics(self, client):
         """Test getting model statistics."""
-        response = self.client.get("/api/models/statistics")
-        self.assertEqual(response.status_code, 200)
-        
+        response = client.get("/api/models/statistics")
+        assert response.status_code == 200
+
         data = response.json()
-        self.assertTrue(data["success"])
-        
+        assert data["success"]
+
         stats = data["data"]
-        self.assertEqual(stats["total_models"], 2)
-        self.assertEqual(stats["cli_models"], 1)
-        self.assertEqual(stats["web_models"], 1)
-        self.assertEqual(stats["favorite_models"], 1)
+        assert stats["total_models"] == 2
+        assert stats["cli_models"] == 1
+        assert stats["web_models"] == 1
+        assert stats["favorite_models"] == 1
+
+
+# Endpoints may cost at most this many times a /health request, which goes
+# through the same routing and test client without touching the registry
+ENDPOINT_BUDGET_FACTOR = 5
+
+
+@pytest.mark.perf
+class TestModelAPIBenchmarks:
+    """Guard the per-request cost of the hot registry endpoints against regressions.
+
+    Each request goes through routing, the registry's SQLite queries and
+    response serialization, so a slowdown in any of them shows up here. The
+    budgets are relative to a /health request, so they hold on any machine.
+    """
+
+    @pytest.fixture
+    def health_time(self, client, best_time_per_call):
+        """Per-request cost of the routing and test client alone."""
+        return best_time_per_call(lambda: client.get("/health"))
+
+    def test_list_models(self, client, best_time_per_call, health_time):
+        """Listing the registry stays within the endpoint budget."""
+        list_time = best_time_per_call(lambda: client.get("/api/models/"))
+        assert list_time < ENDPOINT_BUDGET_FACTOR * health_time, \
+            f"list took {list_time * 1e3:.2f}ms vs health {health_time * 1e3:.2f}ms"
 
+    def test_download_model_file(self, client, best_time_per_call, health_time):
+        """Serving a registered model file stays within the endpoint budget."""
+        download_time = best_time_per_call(lambda: client.get("/api/models/test_cli_model/download/stl"))
+        assert download_time < ENDPOINT_BUDGET_FACTOR * health_time, \
+            f"download took {download_time * 1e3:.2f}ms vs health {health_time * 1e3:.2f}ms"
 
-if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    def test_scan_models(self, client, best_time_per_call, health_time):
+        """Rescanning an already registered output directory stays within the endpoint budget."""
+        client.post("/api/models/scan")
+        scan_time = best_time_per_call(lambda: client.post("/api/models/scan"))
+        assert scan_time < ENDPOINT_BUDGET_FACTOR * health_time, \
+            f"scan took {scan_time * 1e3:.2f}ms vs health {health_time * 1e3:.2f}ms"
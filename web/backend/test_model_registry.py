@@ -2,24 +2,49 @@
 # ABOUTME: Verifies model indexing, database operations, and file system scanning
 
 import unittest
-import tempfile
 import os
 import json
-import shutil
+import orjson
 import time
+from pathlib import Path
 from unittest.mock import Mock, patch
 import sqlite3
+import pytest
 
 from app.core.model_registry import ModelRegistry, ModelRecord
 
+# Empty registry database built once; each test clones it with the backup API
+SCHEMA_TEMPLATE = sqlite3.connect(":memory:")
+ModelRegistry._create_schema(SCHEMA_TEMPLATE)
+
+# Metadata for the scanned test model, serialized once
+SCAN_METADATA = orjson.dumps({
+    "parameters": {"width": 256, "height": 256, "steps": 100},
+    "command_line": "main.py --width 256 --height 256",
+    "description": "Test model",
+    "git_commit_hash": "test123"
+})
+
 
 class TestModelRegistry(unittest.TestCase):
     """Test cases for ModelRegistry functionality."""
     
+    @pytest.fixture(autouse=True)
+    def use_tmp_path(self, tmp_path):
+        """Work in pytest's numbered temporary directory.
+        
+        pytest keeps the directories of the last three runs and removes older
+        ones itself, so no test spends time deleting its files.
+        """
+        self.test_dir = str(tmp_path)
+    
     def setUp(self):
         """Set up test environment with temporary directory and database."""
-        self.test_dir = tempfile.mkdtemp()
-        self.db_path = os.path.join(self.test_dir, "test_models.db")
+        # In-memory database that lives as long as the keeper connection stays open
+        self.db_path = f"file:test_models_{id(self)}?mode=memory&cache=shared"
+        self.db_keeper = sqlite3.connect(self.db_path, uri=True)
+        # Start from a page copy of the prepared schema
+        SCHEMA_TEMPLATE.backup(self.db_keeper)
         self.output_dir = os.path.join(self.test_dir, "output")
         os.makedirs(self.output_dir, exist_ok=True)
         
@@ -28,15 +53,17 @@ class TestModelRegistry(unittest.TestCase):
         
     def tearDown(self):
         """Clean up test environment."""
-        if os.path.exists(self.test_dir):
-            shutil.rmtree(self.test_dir)
+        self.db_keeper.close()
     
     def test_database_initialization(self):
         """Test that database and tables are created correctly."""
-        self.assertTrue(os.path.exists(self.db_path))
+        # A registry given a file path creates the database file
+        db_file = os.path.join(self.test_dir, "test_models.db")
+        ModelRegistry(output_dir=self.output_dir, db_path=db_file)
+        self.assertTrue(os.path.exists(db_file))
         
         # Check that tables exist
-        with sqlite3.connect(self.db_path) as conn:
+        with sqlite3.connect(db_file) as conn:
             cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='models'")
             result = cursor.fetchone()
             self.assertIsNotNone(result)
@@ -68,6 +95,26 @@ class TestModelRegistry(unittest.TestCase):
         self.assertEqual(retrieved.source, "test")
         self.assertEqual(retrieved.parameters["width"], 100)
     
+    def test_register_models_batch(self):
+        """Test registering several models in one call."""
+        models = [
+            ModelRecord(id=f"batch_model_{i}", created_at=time.time() + i, name=f"Batch Model {i}")
+            for i in range(3)
+        ]
+    
+        success = self.registry.register_models(models)
+        self.assertTrue(success)
+    
+        retrieved = self.registry.list_models()
+        self.assertEqual([model.id for model in retrieved], ["batch_model_2", "batch_model_1", "batch_model_0"])
+    
+    def test_connection_closed_after_call(self):
+        """Test that each registry call closes the connection it opened."""
+        with self.registry._connect() as conn:
+            conn.execute("SELECT 1")
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+    
     def test_get_nonexistent_model(self):
         """Test getting a model that doesn't exist."""
         result = self.registry.get_model("nonexistent")
@@ -189,24 +236,10 @@ class TestModelRegistry(unittest.TestCase):
         json_path = os.path.join(self.output_dir, "test_model.json")
         jpg_path = os.path.join(self.output_dir, "test_model.jpg")
         
-        # Create dummy STL file
-        with open(stl_path, 'w') as f:
-            f.write("dummy stl content")
-        
-        # Create JSON metadata file
-        metadata = {
-            "parameters": {"width": 256, "height": 256, "steps": 100},
-            "command_line": "main.py --width 256 --height 256",
-            "description": "Test model",
-            "git_commit_hash": "test123"
-        }
-        
-        with open(json_path, 'w') as f:
-            json.dump(metadata, f)
-        
-        # Create dummy preview file
-        with open(jpg_path, 'w') as f:
-            f.write("dummy jpg content")
+        # Create dummy STL, JSON metadata and preview files
+        Path(stl_path).write_bytes(b"dummy stl content")
+        Path(json_path).write_bytes(SCAN_METADATA)
+        Path(jpg_path).write_bytes(b"dummy jpg content")
         
         # Scan and register
         registered_count = self.registry.scan_and_register_models()
@@ -220,6 +253,7 @@ class TestModelRegistry(unittest.TestCase):
         self.assertTrue(model.name.startswith("test_model"))
         self.assertEqual(model.source, "cli")  # Should detect CLI from command line
         self.assertEqual(model.parameters["width"], 256)
+        self.assertEqual(model.file_sizes, {"stl": 17, "json": len(SCAN_METADATA), "jpg": 17})
     
     def test_scan_partial_files(self):
         """Test scanning with only some files present."""
@@ -1,32 +1,27 @@
 # ABOUTME: Test script to verify physarum_core functionality within Docker container
 # ABOUTME: Tests core simulation and model generation capabilities in containerized environment
 
+import functools
+import io
 import subprocess
-import tempfile
 import json
 import base64
+import numpy as np
 from PIL import Image
 import os
 
+@functools.lru_cache(maxsize=1)
 def create_test_image() -> str:
     """Create a simple test image and return as base64."""
-    # Create a simple 32x32 white image with a black dot
-    img = Image.new('RGB', (32, 32), color='white')
-    pixels = img.load()
+    # Create a simple 32x32 white image with a small black circle in the center
+    pixels = np.full((32, 32, 3), 255, dtype=np.uint8)
+    y, x = np.ogrid[:32, :32]
+    pixels[(x - 16) ** 2 + (y - 16) ** 2 <= 25] = 0
     
-    # Add a small black circle in the center
-    center = 16
-    for x in range(32):
-        for y in range(32):
-            if (x - center) ** 2 + (y - center) ** 2 <= 25:  # Small circle
-                pixels[x, y] = (0, 0, 0)  # Black
-    
-    # Save to temporary file and encode as base64
-    with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
-        img.save(tmp.name, 'PNG')
-        with open(tmp.name, 'rb') as f:
-            img_data = base64.b64encode(f.read()).decode('utf-8')
-        os.unlink(tmp.name)
+    # Encode the PNG in memory
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, 'PNG')
+    img_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
     
     return f"data:image/png;base64,{img_data}"
 
@@ -73,34 +68,19 @@ except Exception as e:
 '''
     
     try:
-        # Write test script to temporary file
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as tmp:
-            tmp.write(test_script)
-            tmp_path = tmp.name
-        
-        # Copy test script into container and run it
         container_name = "physarum-test"
         
-        # Copy file to container
-        copy_cmd = ["docker", "cp", tmp_path, f"{container_name}:/app/test_core.py"]
-        subprocess.run(copy_cmd, check=True, capture_output=True)
-        
-        # Run test inside container
-        exec_cmd = ["docker", "exec", container_name, "python", "/app/test_core.py"]
-        result = subprocess.run(exec_cmd, capture_output=True, text=True, timeout=30)
+        # Stream the script to the container's Python over stdin, so a single
+        # docker exec runs it without copying a file in first
+        exec_cmd = ["docker", "exec", "-i", container_name, "python", "-"]
+        result = subprocess.run(exec_cmd, input=test_script, capture_output=True, text=True, timeout=30)
         
         print(result.stdout)
         if result.stderr:
             print(f"Stderr: {result.stderr}")
-            
-        # Cleanup
-        os.unlink(tmp_path)
         
         return result.returncode == 0
         
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Container exec failed: {e}")
-        return False
     except Exception as e:
         print(f"❌ Core test failed: {e}")
         return False
@@ -6,19 +6,49 @@ import numpy as np
 import subprocess
 import time
 import requests
+from requests.adapters import HTTPAdapter
 import json
-import tempfile
 import os
-from typing import Dict, Any
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from conftest import IMAGE_NAME, REPO_ROOT, current_image_tag, docker_available, image_exists
+
+# Registry image to pull BuildKit cache from in addition to the local image, for
+# CI runners that start without one; unset by default, so no pull is attempted
+REGISTRY_CACHE_REF = os.getenv("DOCKER_CACHE_REF")
+
+# Built images are saved here between runs, named after their build inputs tag
+IMAGE_TARBALL_DIR = Path(tempfile.gettempdir())
+
+def image_tarball_path(image_tag: str) -> Path:
+    """Return where the image with this build inputs tag is saved."""
+    return IMAGE_TARBALL_DIR / f"{image_tag.replace(':', '-')}.tar"
+
+# Checks run inside the container, streamed to its Python over stdin; they all
+# run in one Python process, so skimage is imported once
+CHECKS_SCRIPT = Path(__file__).resolve().parent / "container_checks" / "skimage_checks.py"
+
 
 class SkimageDockerTest:
     """Test class for validating skimage functionality in Docker environment."""
     
-    def __init__(self, container_name: str = "physarum-skimage-test", port: int = 8002):
+    def __init__(self, container_name: str = "physarum-skimage-test", port: int = 8002,
+                 cache_ref: Optional[str] = REGISTRY_CACHE_REF):
         self.container_name = container_name
+        # Optional registry image whose inline cache also seeds the build
+        self.cache_ref = cache_ref
         self.port = port
         self.base_url = f"http://localhost:{port}"
         self.container_id = None
+        self.image_tag = f"{IMAGE_NAME}:latest"
+        # Output of the combined in-container checks, filled on first use
+        self.check_output = None
+        # One keep-alive session for the readiness poll and the API requests
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
     
     def build_and_start_container(self) -> bool:
         """Build Docker image and start container."""
@@ -26,16 +56,18 @@ class SkimageDockerTest:
         
         try:
             # Stop existing container
-            subprocess.run(["docker", "stop", self.container_name], capture_output=True)
-            subprocess.run(["docker", "rm", self.container_name], capture_output=True)
+            subprocess.run(["docker", "rm", "-f", self.container_name], capture_output=True)
             
-            # Build image from backend directory (Railway-compatible)
-            result = subprocess.run(
-                ["docker", "build", "-t", "physarum-backend", "."],
-                capture_output=True, text=True, timeout=300
-            )
-            if result.returncode != 0:
-                print(f"❌ Build failed: {result.stderr}")
+            # Share the deployment test's build inputs tags, so an image either
+            # suite built for the current sources is reused by both
+            self.image_tag = current_image_tag()
+            if image_exists(self.image_tag):
+                print(f"✅ Docker image {self.image_tag} is up to date, skipping build")
+            elif self.load_saved_image():
+                print(f"✅ Loaded saved Docker image {self.image_tag}, skipping build")
+            elif self.build_image():
+                self.save_image()
+            else:
                 return False
             
             # Start container
@@ -43,7 +75,7 @@ class SkimageDockerTest:
                 "docker", "run", "-d", 
                 "-p", f"{self.port}:8000",
                 "--name", self.container_name,
-                "physarum-backend"
+                self.image_tag
             ], capture_output=True, text=True)
             
             if result.returncode != 0:
@@ -53,126 +85,175 @@ class SkimageDockerTest:
             self.container_id = result.stdout.strip()
             print(f"✅ Container started: {self.container_id[:12]}")
             
-            # Wait for readiness
-            time.sleep(10)
-            return True
+            return self.wait_until_ready()
             
         except Exception as e:
             print(f"❌ Setup error: {e}")
             return False
     
+    def wait_until_ready(self, timeout: float = 30.0) -> bool:
+        """Poll the health endpoint until the API answers, backing off up to 1s between tries."""
+        deadline = time.monotonic() + timeout
+        delay = 0.1
+        while time.monotonic() < deadline:
+            try:
+                response = self.session.get(f"{self.base_url}/health", timeout=1)
+                if response.status_code == 200:
+                    print("✅ API is ready")
+                    return True
+            except requests.RequestException:
+                pass
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+        
+        print(f"❌ API not ready after {timeout:.0f}s")
+        return False
+    
+    def build_image(self) -> bool:
+        """Build the image under its build inputs tag and as latest."""
+        # The previously built local image carries inline BuildKit cache
+        # metadata, so unchanged layers are reused through --cache-from
+        cache_args = ["--cache-from", f"{IMAGE_NAME}:latest"]
+        if self.cache_ref:
+            # Fetch the registry cache image; a missing image only means a colder build
+            subprocess.run(["docker", "pull", self.cache_ref], capture_output=True)
+            cache_args += ["--cache-from", self.cache_ref]
+        
+        result = subprocess.run(
+            [
+                "docker", "build", "--quiet",
+                "--build-arg", "BUILDKIT_INLINE_CACHE=1",
+                *cache_args,
+                "-t", self.image_tag,
+                "-t", f"{IMAGE_NAME}:latest", "."
+            ],
+            capture_output=True, text=True, timeout=300,
+            cwd=REPO_ROOT, env={**os.environ, "DOCKER_BUILDKIT": "1"}
+        )
+        if result.returncode != 0:
+            print(f"❌ Build failed: {result.stderr}")
+            return False
+        return True
+    
+    def load_saved_image(self) -> bool:
+        """Load the image saved for these build inputs, if there is one.
+        
+        Loading a saved image is much faster than rebuilding after the daemon's
+        images and layer cache were pruned.
+        """
+        tarball = image_tarball_path(self.image_tag)
+        if not tarball.exists():
+            return False
+        result = subprocess.run(["docker", "load", "-i", str(tarball)], capture_output=True, text=True)
+        return result.returncode == 0 and image_exists(self.image_tag)
+    
+    def save_image(self):
+        """Save the freshly built image to disk, replacing images saved for older inputs."""
+        for old_tarball in IMAGE_TARBALL_DIR.glob(f"{IMAGE_NAME}-*.tar"):
+            old_tarball.unlink(missing_ok=True)
+        subprocess.run(
+            ["docker", "save", "-o", str(image_tarball_path(self.image_tag)), self.image_tag],
+            capture_output=True
+        )
+    
     def stop_container(self):
         """Stop and clean up the container."""
         if self.container_name:
-            subprocess.run(["docker", "stop", self.container_name], capture_output=True)
-            subprocess.run(["docker", "rm", self.container_name], capture_output=True)
+            subprocess.run(["docker", "rm", "-f", self.container_name], capture_output=True)
+        self.session.close()
     
     def test_skimage_import_in_container(self) -> bool:
         """Test that skimage can be imported in the Docker container."""
         print("📦 Testing skimage import in container...")
         
         try:
-            # Execute import test directly in container
-            result = subprocess.run([
-                "docker", "exec", self.container_name,
-                "python", "-c", "import skimage; from skimage import measure; print('skimage import successful')"
-            ], capture_output=True, text=True, timeout=30)
-            
-            if result.returncode == 0 and "skimage import successful" in result.stdout:
+            # The import runs first in the shared checks process
+            output = self.run_container_checks()
+            if "SUCCESS:import" in output:
                 print("✅ skimage imports successfully in container")
                 return True
             else:
-                print(f"❌ skimage import failed: {result.stderr}")
+                print(f"❌ skimage import failed: {output}")
                 return False
                 
         except Exception as e:
             print(f"❌ skimage import test error: {e}")
             return False
     
+    def run_container_checks(self) -> str:
+        """Run the combined in-container checks once and return their output.
+        
+        The checks script is executed a single time; later calls reuse the
+        output, so each check's test method only looks for its own result.
+        """
+        if self.check_output is None:
+            # Execute all checks in one container Python process, reading
+            # the script from stdin so the container needs no copy or mount;
+            # -u flushes each result line as soon as it is printed
+            proc = subprocess.Popen(
+                ["docker", "exec", "-i", self.container_name, "python", "-u", "-"],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+            )
+            proc.stdin.write(CHECKS_SCRIPT.read_text())
+            proc.stdin.close()
+            
+            # A hung check is killed after 120s; a failed one stops the run at
+            # its first error line instead of waiting for the rest
+            watchdog = threading.Timer(120, proc.kill)
+            watchdog.start()
+            lines = []
+            try:
+                for line in proc.stdout:
+                    lines.append(line)
+                    if line.startswith(("ERROR:", "IMPORT_ERROR:")):
+                        proc.terminate()
+                        break
+            finally:
+                watchdog.cancel()
+                proc.stdout.close()
+                proc.wait()
+            self.check_output = "".join(lines)
+        return self.check_output
+    
     def test_marching_cubes_in_container(self) -> bool:
         """Test marching cubes functionality specifically in the container."""
         print("🧊 Testing marching cubes in container...")
         
-        # Create a test script that exercises marching cubes
-        test_script = '''
-import numpy as np
-from skimage import measure
-import tempfile
-import os
-
-try:
-    # Create a simple 3D volume with a sphere
-    x, y, z = np.mgrid[-10:10:20j, -10:10:20j, -10:10:20j]
-    volume = (x**2 + y**2 + z**2) <= 8**2
-    volume = volume.astype(float)
-    
-    # Apply marching cubes - this is the key skimage functionality used in production
-    vertices, faces, normals, values = measure.marching_cubes(
-        volume, 
-        level=0.5,
-        spacing=(1.0, 1.0, 1.0)
-    )
-    
-    # Validate results
-    if len(vertices) > 0 and len(faces) > 0:
-        print(f"SUCCESS: Generated {len(vertices)} vertices and {len(faces)} faces")
-    else:
-        print("ERROR: No mesh generated")
-        exit(1)
-        
-except ImportError as e:
-    print(f"IMPORT_ERROR: {e}")
-    exit(1)
-except Exception as e:
-    print(f"ERROR: {e}")
-    exit(1)
-'''
-        
         try:
-            # Write test script to temporary file
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-                f.write(test_script)
-                script_path = f.name
-            
-            # Copy script to container
-            subprocess.run([
-                "docker", "cp", script_path, f"{self.container_name}:/tmp/test_marching_cubes.py"
-            ], check=True)
-            
-            # Execute test in container
-            result = subprocess.run([
-                "docker", "exec", self.container_name,
-                "python", "/tmp/test_marching_cubes.py"
-            ], capture_output=True, text=True, timeout=60)
-            
-            # Clean up
-            os.unlink(script_path)
-            
-            if result.returncode == 0 and "SUCCESS:" in result.stdout:
+            output = self.run_container_checks()
+            if "SUCCESS:marching_cubes" in output:
                 print("✅ marching_cubes works in container")
                 return True
             else:
-                print(f"❌ marching_cubes failed: {result.stdout} {result.stderr}")
+                print(f"❌ marching_cubes failed: {output}")
                 return False
                 
         except Exception as e:
             print(f"❌ marching_cubes test error: {e}")
             return False
     
+    def test_physarum_core_with_skimage(self) -> bool:
+        """Test that physarum_core module works with skimage in container."""
+        print("🦠 Testing physarum_core with skimage...")
+        
+        try:
+            output = self.run_container_checks()
+            if "SUCCESS:physarum" in output:
+                print("✅ physarum_core works with skimage in container")
+                return True
+            else:
+                print(f"❌ physarum_core + skimage test failed: {output}")
+                return False
+                
+        except Exception as e:
+            print(f"❌ physarum_core + skimage test error: {e}")
+            return False
+    
     def test_3d_model_generation_endpoint(self) -> bool:
         """Test that the 3D model generation endpoint works with skimage."""
         print("🎯 Testing 3D model generation endpoint...")
         
         try:
-            # Wait for API to be ready
-            for _ in range(10):
-                try:
-                    response = requests.get(f"{self.base_url}/health", timeout=5)
-                    if response.status_code == 200:
-                        break
-                except:
-                    time.sleep(2)
-            
             # Create a minimal image for 3D model generation
             # This will trigger the path that uses skimage.measure.marching_cubes
             test_data = {
@@ -190,7 +271,7 @@ except Exception as e:
                 }
             }
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/simulate", 
                 json=test_data,
                 timeout=120  # Longer timeout for 3D generation
@@ -213,88 +294,6 @@ except Exception as e:
             print(f"❌ 3D model generation test error: {e}")
             return False
     
-    def test_physarum_core_with_skimage(self) -> bool:
-        """Test that physarum_core module works with skimage in container."""
-        print("🦠 Testing physarum_core with skimage...")
-        
-        # Test script that imports and uses the actual production code path
-        test_script = '''
-import numpy as np
-import sys
-sys.path.append("/app")
-
-try:
-    from physarum_core.models.model_3d_smooth import SmoothModel3DGenerator
-    from physarum_core.simulation import PhysarumSimulation
-    
-    # Create a minimal simulation
-    sim = PhysarumSimulation(50, 50, 10, 0.1)
-    
-    # Create 3D generator - this will use skimage for marching cubes
-    generator = SmoothModel3DGenerator(
-        sim, 
-        layer_height=1.0, 
-        threshold=0.1,
-        smoothing_iterations=1,
-        smoothing_type="boundary_outline"
-    )
-    
-    # Run a few simulation steps and capture layers
-    for i in range(5):
-        sim.step()
-        if i % 2 == 0:
-            generator.capture_layer()
-    
-    # This is the critical test - generate mesh using skimage.measure.marching_cubes
-    if generator.get_layer_count() > 0:
-        try:
-            mesh = generator.generate_mesh()
-            print(f"SUCCESS: Generated mesh with {len(mesh.vectors)} triangles")
-        except Exception as mesh_error:
-            print(f"MESH_ERROR: {mesh_error}")
-            exit(1)
-    else:
-        print("SUCCESS: No layers captured (simulation too short)")
-    
-except ImportError as e:
-    print(f"IMPORT_ERROR: {e}")
-    exit(1)
-except Exception as e:
-    print(f"ERROR: {e}")
-    exit(1)
-'''
-        
-        try:
-            # Write test script
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-                f.write(test_script)
-                script_path = f.name
-            
-            # Copy to container
-            subprocess.run([
-                "docker", "cp", script_path, f"{self.container_name}:/tmp/test_physarum_skimage.py"
-            ], check=True)
-            
-            # Execute test
-            result = subprocess.run([
-                "docker", "exec", self.container_name,
-                "python", "/tmp/test_physarum_skimage.py"
-            ], capture_output=True, text=True, timeout=120)
-            
-            # Clean up
-            os.unlink(script_path)
-            
-            if result.returncode == 0 and "SUCCESS:" in result.stdout:
-                print("✅ physarum_core works with skimage in container")
-                return True
-            else:
-                print(f"❌ physarum_core + skimage test failed: {result.stdout} {result.stderr}")
-                return False
-                
-        except Exception as e:
-            print(f"❌ physarum_core + skimage test error: {e}")
-            return False
-    
     def run_all_skimage_tests(self) -> bool:
         """Run all skimage-specific tests in Docker context."""
         print("🧪 Starting skimage Docker tests...\n")
@@ -334,6 +333,7 @@ except Exception as e:
             print("🔧 scikit-image may not work correctly in production")
             return False
 
+@pytest.mark.skipif(not docker_available(), reason="Docker is not available")
 def test_skimage_docker_integration():
     """Pytest integration for skimage Docker tests."""
     tester = SkimageDockerTest()